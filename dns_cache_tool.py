@@ -4,7 +4,6 @@
 import os
 import sys
 import dns.resolver
-import requests
 import socket
 import json
 import time
@@ -12,13 +11,68 @@ import re
 import threading
 import csv
 import configparser
-import copy
-import random
-import statistics
+import asyncio
+import tempfile
+import shutil
+from enum import IntEnum
+from pathlib import Path
 from urllib.parse import urlparse, urljoin
-from bs4 import BeautifulSoup
 from concurrent.futures import ThreadPoolExecutor
-from queue import Queue
+
+try:
+    import aiodns  # 可选依赖，安装后异步批量查询将通过 c-ares 解析
+except ImportError:
+    aiodns = None
+
+RESOLVE_CACHE_TTL = 300 # 内存中DNS结果缓存的最长有效期(秒)，DNS.CacheTTL 更小时以其为准
+
+class ProgressKind(IntEnum):
+    """进度回调的类型标记，progress_callback 的第一个参数
+
+    COLLECT: (domain, collected_count, target_count)
+    QUERY:   (success_count, processed_count, total_count)
+    """
+    COLLECT = 1
+    QUERY = 2
+
+def _best_effort_unlink(path, retries=3) -> bool:
+    """删除文件，不预先检查是否存在。文件不存在视为成功；
+    Windows 上文件被其他进程（如杀毒软件）短暂占用时稍后重试。返回文件是否已不存在。"""
+    for attempt in range(retries):
+        try:
+            os.unlink(path)
+            return True
+        except FileNotFoundError:
+            return True
+        except PermissionError:
+            if attempt + 1 < retries:
+                time.sleep(0.05)
+    return False
+
+def _atomic_write_text(path, write):
+    """先由 write(f) 写入同目录下的临时文件，再替换目标文件，写入中途出错不会留下不完整的文件。
+
+    目标是符号链接时替换其指向的文件；保留已有文件的权限，新文件使用按 umask 计算的默认权限。
+    """
+    target = os.path.realpath(path)
+    temp_path = None
+    try:
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=os.path.dirname(target),
+                                         prefix=f".{os.path.basename(target)}-", suffix='.tmp', delete=False) as f:
+            temp_path = f.name
+            write(f)
+        try:
+            shutil.copymode(target, temp_path)
+        except FileNotFoundError:
+            # NamedTemporaryFile 创建的文件权限为 0600，改为普通新建文件的权限
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(temp_path, 0o666 & ~umask)
+        os.replace(temp_path, target)
+    except BaseException:
+        if temp_path:
+            _best_effort_unlink(temp_path)
+        raise
 
 class DNSRateLimiter:
     """DNS查询速率限制器，确保每秒不超过指定次数的查询"""
@@ -44,6 +98,126 @@ class DNSRateLimiter:
             # 记录当前查询时间
             self.query_times.append(time.time())
 
+    def set_qps(self, queries_per_second) -> bool:
+        """修改速率上限，保留已有的查询记录，正在进行的查询不受影响。返回上限是否发生了变化。"""
+        if queries_per_second == self.queries_per_second:
+            return False
+        # 单个属性赋值是原子的，不获取锁：wait_if_needed 可能持有锁睡眠近一秒，
+        # 界面线程保存配置时等待该锁会使界面卡顿。下一次检查即使用新的上限
+        self.queries_per_second = queries_per_second
+        return True
+
+    async def async_wait_if_needed(self):
+        """异步版本的速率限制，等待期间不阻塞事件循环"""
+        while True:
+            with self.lock:
+                current_time = time.time()
+                self.query_times = [t for t in self.query_times if current_time - t < 1.0]
+                if len(self.query_times) < self.queries_per_second:
+                    self.query_times.append(current_time)
+                    return
+                sleep_time = 1.0 - (current_time - self.query_times[0])
+            await asyncio.sleep(max(sleep_time, 0))
+
+class DNSResultCache:
+    """DNS查询结果缓存，按域名保存成功的解析结果，超过有效期后失效。
+
+    指定 path 时缓存会以JSON文件形式持久化，供下次运行复用；
+    指定 maxsize 时超出容量会淘汰最久未使用的记录。
+    """
+    def __init__(self, path=None, ttl=3600, maxsize=None):
+        self.path = path
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.entries = {}  # 域名 -> {'expires': 过期时间戳, 'result': 查询结果}，按最近使用排序
+        self.lock = threading.Lock()
+        if self.path:
+            self.load()
+    
+    def load(self) -> tuple[bool, str]:
+        """从缓存文件加载未过期的记录。返回 (success_status, message)。"""
+        if not self.path:
+            return True, "缓存文件不存在，使用空缓存"
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            now = time.time()
+            with self.lock:
+                self.entries = {
+                    domain: entry for domain, entry in data.items()
+                    if isinstance(entry, dict) and entry.get('expires', 0) > now
+                }
+            return True, f"已加载 {len(self.entries)} 条DNS缓存记录"
+        except FileNotFoundError:
+            return True, "缓存文件不存在，使用空缓存"
+        except Exception as e:
+            self.entries = {}
+            return False, f"加载DNS缓存文件出错: {e}"
+    
+    def save(self) -> tuple[bool, str]:
+        """将未过期的记录写入缓存文件。返回 (success_status, message)。"""
+        if not self.path:
+            return False, "未指定缓存文件路径"
+        now = time.time()
+        with self.lock:
+            data = {domain: entry for domain, entry in self.entries.items() if entry['expires'] > now}
+        try:
+            _atomic_write_text(self.path, lambda f: json.dump(data, f, ensure_ascii=False))
+            return True, f"DNS缓存已保存到: {self.path}"
+        except Exception as e:
+            return False, f"保存DNS缓存文件时出错: {e}"
+    
+    def get(self, domain):
+        """获取未过期的缓存结果，不存在或已过期时返回None"""
+        with self.lock:
+            entry = self.entries.get(domain)
+            if entry is None:
+                return None
+            if entry['expires'] <= time.time():
+                del self.entries[domain]
+                return None
+            if self.maxsize:
+                self.entries[domain] = self.entries.pop(domain)  # 移到末尾，标记为最近使用
+            return entry['result']
+    
+    def set(self, domain, result):
+        """缓存一条成功的查询结果，失败的结果不缓存。
+
+        结果带有记录自身的TTL时，有效期取该TTL与 self.ttl 中较小的一个，
+        缓存不会比DNS记录本身保留得更久。
+        """
+        if not result.get('success'):
+            return
+        record_ttl = result.get('ttl')
+        lifetime = self.ttl if record_ttl is None else min(record_ttl, self.ttl)
+        if lifetime <= 0:
+            return
+        with self.lock:
+            self.entries.pop(domain, None)
+            if self.maxsize and len(self.entries) >= self.maxsize:
+                del self.entries[next(iter(self.entries))]  # 淘汰最久未使用的记录
+            self.entries[domain] = {'expires': time.time() + lifetime, 'result': result}
+    
+    def split(self, domains) -> tuple[dict, list]:
+        """将域名分为缓存命中和未命中两部分。返回 (命中结果字典, 未命中域名列表)。"""
+        hits = {}
+        misses = []
+        for domain in domains:
+            result = self.get(domain)
+            if result is None:
+                misses.append(domain)
+            else:
+                hits[domain] = result
+        return hits, misses
+    
+    def clear(self):
+        """清空缓存"""
+        with self.lock:
+            self.entries = {}
+    
+    def __len__(self):
+        return len(self.entries)
+
 class Config:
     """配置管理器"""
     def __init__(self, config_file="config.ini"):
@@ -60,6 +234,7 @@ class Config:
                 'MaxWorkers': '12',
                 'Timeout': '1',
                 'BatchSize': '100',
+                'CacheTTL': '300',
             },
             'Crawler': {
                 'ParseJavaScript': 'false',
@@ -88,6 +263,7 @@ class Config:
             'MaxWorkers': '最大线程数',
             'Timeout': '超时时间(秒)',
             'BatchSize': '批处理大小',
+            'CacheTTL': '缓存有效期(秒)',
             'ParseJavaScript': '解析JavaScript文件',
             'ParseCSS': '解析CSS文件',
             'ParseImages': '解析图片链接',
@@ -106,6 +282,7 @@ class Config:
             'MaxWorkers': 'DNS查询使用的最大线程数',
             'Timeout': 'DNS查询和网页请求的超时时间',
             'BatchSize': '每批处理的域名数量',
+            'CacheTTL': '成功的DNS查询结果在本地缓存中保留的最长时间，不超过记录自身的TTL，过期后重新查询',
             'ParseJavaScript': '是否从JavaScript文件中提取域名（true/false）',
             'ParseCSS': '是否从CSS文件中提取域名（true/false）',
             'ParseImages': '是否从图片链接中提取域名（true/false）',
@@ -116,6 +293,31 @@ class Config:
             'IncludeDNSInfo': '保存域名文件时是否包含DNS查询结果（true/false）'
         }
         
+        # 预先建立名称和描述的查找表。configparser 返回的选项名是小写的，
+        # 因此同时以原始键和小写键建立索引，查找时只需一次字典访问
+        self._name_cache = {key.lower(): name for key, name in self.config_names.items()}
+        self._name_cache.update(self.config_names)
+        self._description_cache = {key.lower(): desc for key, desc in self.config_descriptions.items()}
+        self._description_cache.update(self.config_descriptions)
+        
+        # 选项的值类型，编辑配置时据此选择输入控件；未列出的选项按字符串处理
+        self.config_types = {
+            ('General', 'TargetCount'): int,
+            ('DNS', 'QueriesPerSecond'): int,
+            ('DNS', 'MaxWorkers'): int,
+            ('DNS', 'Timeout'): float,
+            ('DNS', 'BatchSize'): int,
+            ('DNS', 'CacheTTL'): int,
+            ('Crawler', 'ParseJavaScript'): bool,
+            ('Crawler', 'ParseCSS'): bool,
+            ('Crawler', 'ParseImages'): bool,
+            ('Crawler', 'ParseMetaTags'): bool,
+            ('Crawler', 'Timeout'): int,
+            ('Crawler', 'CollectThreads'): int,
+            ('Export', 'IncludeDNSInfo'): bool,
+        }
+        self._type_cache = {(section, option.lower()): value_type for (section, option), value_type in self.config_types.items()}
+        
         self.load_config() # 在__init__中，我们通常不直接向Config()的调用者返回状态。
                            # 如果调用者需要状态和消息，可以再次调用load_config()。
     
@@ -127,31 +329,78 @@ class Config:
                 self.config.add_section(section)
             for option, value in options.items():
                 self.config.set(section, option, value)
+        self._refresh_typed()
         
-        # 尝试从文件加载配置
-        if os.path.exists(self.config_file):
-            try:
-                self.config.read(self.config_file, encoding='utf-8')
-                return True, f"已加载配置文件: {self.config_file}" 
-            except Exception as e:
-                return False, f"加载配置文件出错: {e}" 
-        else:
+        # 尝试从文件加载配置，一次读入整个文件后再解析
+        try:
+            self.config.read_string(Path(self.config_file).read_text(encoding='utf-8'), source=self.config_file)
+            self._refresh_typed()
+            return True, f"已加载配置文件: {self.config_file}" 
+        except FileNotFoundError:
             # 保存默认配置
             created, message = self.save_config() 
             if created:
                 return True, f"已创建默认配置文件: {self.config_file}" 
             else:
                 return False, f"创建默认配置文件失败: {message}" 
+        except Exception as e:
+            return False, f"加载配置文件出错: {e}" 
+    
+    def load_from_path(self, path) -> tuple[bool, str]:
+        """从其他配置文件（如性能测试生成的优化配置）加载设置并替换当前配置，不写入文件。返回 (success_status, message)。"""
+        parser = configparser.ConfigParser()
+        parser.read_dict(self.default_config) # 文件中缺少的选项使用默认值
+        try:
+            parser.read_string(Path(path).read_text(encoding='utf-8'), source=str(path))
+        except FileNotFoundError:
+            return False, f"配置文件不存在: {path}"
+        except Exception as e:
+            return False, f"加载配置文件出错: {e}"
+        
+        previous = self.config
+        self.config = parser
+        try:
+            self._refresh_typed()
+        except ValueError as e:
+            self.config = previous
+            return False, f"配置文件中的数值无效: {e}"
+        return True, f"已加载配置文件: {path}"
+    
+    def apply_values(self, values) -> tuple[bool, str]:
+        """将 {节: {选项: 值}} 写入内存中的配置（如性能测试的推荐参数），不读写文件。返回 (success_status, message)。"""
+        previous = {s: dict(self.config.items(s, raw=True)) for s in values if self.config.has_section(s)}
+        self.config.read_dict(values)
+        try:
+            self._refresh_typed()
+        except ValueError as e:
+            self.config.read_dict(previous)
+            return False, f"配置中的数值无效: {e}"
+        return True, f"已更新 {sum(len(options) for options in values.values())} 个配置项"
     
     def save_config(self) -> tuple[bool, str]:
         """保存配置到文件。返回 (success_status, message)。"""
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                self.config.write(f)
+            self._refresh_typed() # 数值无效时在写入文件之前失败
+            # 写入中途出错不会留下不完整的配置文件
+            _atomic_write_text(self.config_file, self.config.write)
             return True, f"配置已保存到: {self.config_file}" 
         except Exception as e:
             return False, f"保存配置文件时出错: {e}" 
     
+    def _refresh_typed(self):
+        """将频繁读取的数值配置转换为普通属性，使用时无需再经过 configparser 查找和转换。
+
+        任一数值无效时抛出 ValueError，且不修改已有的属性。
+        """
+        target_count = self.config.getint('General', 'TargetCount')
+        qps = self.config.getint('DNS', 'QueriesPerSecond')
+        cache_ttl = self.config.getint('DNS', 'CacheTTL')
+        if cache_ttl < 0:
+            raise ValueError(f"CacheTTL 不能为负数: {cache_ttl}")
+        self.target_count = target_count
+        self.qps = qps
+        self.cache_ttl = cache_ttl
+    
     def get(self, section, option, fallback=None):
         """获取配置值"""
         return self.config.get(section, option, fallback=fallback)
@@ -174,27 +423,75 @@ class Config:
             self.config.add_section(section)
         self.config.set(section, option, str(value))
     
+    def get_type(self, section, option):
+        """获取选项的值类型：int、float、bool 或 str"""
+        return self._type_cache.get((section, option.lower()), str)
+    
     def get_name(self, key):
         """获取配置项的中文名称"""
-        return self.config_names.get(key, key)
+        return self._name_cache.get(key, key)
     
     def get_description(self, key):
         """获取配置项的中文描述"""
-        return self.config_descriptions.get(key, "")
+        return self._description_cache.get(key, "")
+
+class DNSResultWriter:
+    """逐条写出DNS查询结果的导出文件，输出格式与 DNSCacheTool.export_results 相同。
+
+    json 格式只写入解析成功的域名列表；csv 格式写入每个域名的解析状态和IP地址。
+    """
+    def __init__(self, path, format_type, buffering=-1):
+        self.format_type = format_type.lower()
+        if self.format_type not in ('json', 'csv'):
+            raise ValueError(f"不支持的导出格式: {format_type}")
+        self.path = path
+        self.count = 0  # 已写入的记录数
+        self.file = open(path, 'w', encoding='utf-8', newline='', buffering=buffering)
+        if self.format_type == 'csv':
+            self.csv_writer = csv.writer(self.file)
+            self.csv_writer.writerow(['域名', '解析状态', 'IP地址'])
+        else:
+            self.file.write('[')
+    
+    def write(self, domain, result):
+        """写入一个域名的查询结果"""
+        if self.format_type == 'csv':
+            ip_addresses = ';'.join(result['ip_addresses']) if result['ip_addresses'] else ''
+            self.csv_writer.writerow([domain, '成功' if result['success'] else '失败', ip_addresses])
+            self.count += 1
+        elif result['success']:
+            self.file.write(('\n  ' if self.count == 0 else ',\n  ') + json.dumps(domain, ensure_ascii=False))
+            self.count += 1
+    
+    def close(self):
+        """补全文件结尾并关闭文件"""
+        if self.file.closed:
+            return
+        if self.format_type == 'json':
+            self.file.write('\n]' if self.count else ']')
+        self.file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
 class DNSPerformanceTester:
     """DNS性能测试工具，用于测试不同参数下的性能表现"""
     
-    def __init__(self, test_domains_file=None, output_dir="test_results", config=None, output_callback=None): # 添加了 output_callback
+    def __init__(self, test_domains_file=None, output_dir="test_results", config=None, output_callback=None, test_domains=None): # 添加了 output_callback
         self.output_callback = output_callback
-        # 固定测试数据
-        self.test_domains = []
-        self.load_test_domains(test_domains_file) # load_test_domains 将使用 output_callback
+        # 固定测试数据：优先使用直接传入的域名列表，否则从文件或默认列表加载
+        self.test_domains = list(test_domains) if test_domains else []
+        if self.test_domains:
+            if self.output_callback: self.output_callback(f"使用传入的 {len(self.test_domains)} 个测试域名")
+        else:
+            self.load_test_domains(test_domains_file) # load_test_domains 将使用 output_callback
         
         # 确保结果目录存在
         self.output_dir = output_dir
-        if not os.path.exists(self.output_dir):
-            os.makedirs(self.output_dir)
+        os.makedirs(self.output_dir, exist_ok=True)
         
         # 使用传入的配置或创建新配置
         self.config = config
@@ -226,6 +523,15 @@ class DNSPerformanceTester:
             'CollectThreads': '域名收集线程数 (CollectThreads)'
         }
         
+        # 参数所在的配置节
+        self.param_sections = {
+            'QueriesPerSecond': 'DNS',
+            'MaxWorkers': 'DNS',
+            'Timeout': 'DNS',
+            'BatchSize': 'DNS',
+            'CollectThreads': 'Crawler'
+        }
+        
         # 参数简称映射
         self.param_short_names = {
             'QueriesPerSecond': '每秒查询次数',
@@ -244,8 +550,8 @@ class DNSPerformanceTester:
     
     def load_test_domains(self, file_path=None):
         """加载测试域名"""
-        # 如果提供了文件，从文件加载域名
-        if file_path and os.path.exists(file_path):
+        # 如果提供了文件，从文件加载域名（文件不存在时直接使用默认域名）
+        if file_path:
             try:
                 with open(file_path, 'r', encoding='utf-8') as f:
                     data = json.load(f)
@@ -254,6 +560,8 @@ class DNSPerformanceTester:
                     elif isinstance(data, dict) and 'domains' in data:
                         self.test_domains = data['domains']
                     if self.output_callback: self.output_callback(f"从文件加载了 {len(self.test_domains)} 个测试域名: {file_path}")
+            except FileNotFoundError:
+                pass
             except Exception as e:
                 if self.output_callback: self.output_callback(f"加载测试域名文件 {file_path} 出错: {e}", is_error=True)
                 pass # 如果文件加载失败，允许继续使用默认域名
@@ -338,6 +646,11 @@ class DNSPerformanceTester:
     
     def test_parameter(self, param_name, param_value):
         """测试单个参数的性能"""
+        # 仅性能测试使用的模块，在首次测试时才导入
+        import copy
+        import random
+        import statistics
+        
         # 创建一个基于默认参数的测试配置
         test_params = copy.deepcopy(self.default_params)
         test_params[param_name] = param_value
@@ -524,6 +837,7 @@ QueriesPerSecond = {QueriesPerSecond}
 MaxWorkers = {MaxWorkers}
 Timeout = {Timeout}
 BatchSize = {BatchSize}
+CacheTTL = 300
 
 [Crawler]
 ParseJavaScript = false
@@ -539,11 +853,6 @@ DefaultFormat = json
 IncludeDNSInfo = true
 """.format(**self.default_params)
         
-        config_path = os.path.join(self.output_dir, "optimal_config.ini")
-        with open(config_path, 'w', encoding='utf-8') as f: # 这个 with 语句没有 try-except 包裹
-            f.write(config_content)
-        
-        
         config_path = os.path.join(self.output_dir, "optimal_config.ini")
         try:
             with open(config_path, 'w', encoding='utf-8') as f:
@@ -557,6 +866,13 @@ IncludeDNSInfo = true
         
         return self.default_params, readable_result_file_path, config_path
 
+    def get_optimal_config_values(self) -> dict[str, dict[str, str]]:
+        """按配置节返回推荐参数，可直接传给 Config.apply_values，无需再读取 optimal_config.ini。"""
+        values = {}
+        for param, value in self.default_params.items():
+            values.setdefault(self.param_sections[param], {})[param] = str(value)
+        return values
+
     def get_recommendations_text(self) -> tuple[str, str]: 
         """获取推荐参数的文本描述和优化配置文件的路径。"""
         recommendations_text = "DNS缓存工具性能测试完成，推荐参数设置:\n"
@@ -589,18 +905,24 @@ class DNSCacheTool:
         self.only_subdomains = False  # 是否只收集子域名
         self.base_domain = None  # 基础域名
         self.current_source_file = None  # 当前使用的源文件
+        self.export_writer = None  # 收集域名时同步导出结果的写入器
         
         # 从配置中读取设置
-        self.target_count = self.config.getint('General', 'TargetCount')
+        self.target_count = self.config.target_count
         self.data_dir = self.config.get('General', 'DataDirectory')
         self.current_file = None
         self.rate_limiter = DNSRateLimiter(
-            queries_per_second=self.config.getint('DNS', 'QueriesPerSecond')
+            queries_per_second=self.config.qps
+        )
+        # 内存中的DNS结果缓存，批量查询时命中的域名不再重新解析；
+        # 有效期同时受记录自身的TTL限制（见 DNSResultCache.set）
+        self.resolve_cache = DNSResultCache(
+            ttl=min(self.config.cache_ttl, RESOLVE_CACHE_TTL),
+            maxsize=50000
         )
         
         # 创建数据目录
-        if not os.path.exists(self.data_dir):
-            os.makedirs(self.data_dir)
+        os.makedirs(self.data_dir, exist_ok=True)
     
     def extract_domain(self, url):
         """从URL中提取域名"""
@@ -628,6 +950,10 @@ class DNSCacheTool:
     
     def get_links_from_domain(self, domain):
         """获取域名页面上的所有链接并增强域名提取能力"""
+        # requests 和 bs4 导入较慢且只有域名收集会用到，延迟到首次收集时导入
+        import requests
+        from bs4 import BeautifulSoup
+        
         links = set()
         try:
             headers = {
@@ -751,7 +1077,8 @@ class DNSCacheTool:
             'success': False,
             'ip_addresses': [],
             'timestamp': time.time(),
-            'error': None
+            'error': None,
+            'ttl': None # 记录自身的TTL（秒），socket 解析无法获得时为None
         }
         
         try:
@@ -771,6 +1098,7 @@ class DNSCacheTool:
                 
                 result['success'] = True # 如果dns.resolver成功，则标记为成功
                 result['ip_addresses'] = [str(rdata) for rdata in answers] # 覆盖之前的空列表
+                result['ttl'] = answers.rrset.ttl
                 result['error'] = None # 清除之前的socket错误，因为dns.resolver成功了
             except Exception as dns_error:
                 result['success'] = False # 确保如果dns_error发生，success为False
@@ -791,7 +1119,7 @@ class DNSCacheTool:
             
         self.visited_domains.add(domain)
         if self.progress_callback: # 使用 progress_callback
-            self.progress_callback(f"正在处理域名: {domain}", len(self.collected_domains), self.target_count)
+            self.progress_callback(ProgressKind.COLLECT, domain, len(self.collected_domains), self.target_count)
         
         try:
             # 获取该域名上的链接，访问网页时系统会自动执行DNS解析
@@ -801,6 +1129,10 @@ class DNSCacheTool:
                 # 记录成功访问的域名
                 self.collected_domains.add(domain)
                 
+                # 同步导出该域名的DNS结果
+                if self.export_writer:
+                    self.export_writer.write(domain, self.dns_results.get(domain) or {'success': False, 'ip_addresses': []})
+                
                 # 添加新发现的域名到待访问列表
                 new_domains = {d for d in new_links if d not in self.visited_domains}
                 self.domains_to_visit.update(new_domains)
@@ -814,8 +1146,12 @@ class DNSCacheTool:
             if self.message_callback: # 使用 message_callback
                 self.message_callback(f"处理域名 {domain} 时出错: {e}")
 
-    def collect_domains(self, start_domain, only_subdomains=False) -> tuple[int, str | None]: # 添加了返回类型
-        """从起始域名开始收集域名。返回 (收集到的域名数量, 最终保存文件路径)。"""
+    def collect_domains(self, start_domain, only_subdomains=False, export_format=None) -> tuple[int, str | None]: # 添加了返回类型
+        """从起始域名开始收集域名。返回 (收集到的域名数量, 最终保存文件路径)。
+        
+        参数:
+            export_format (str): 'json' 或 'csv' 时，在收集过程中将每个域名的DNS结果直接写入导出文件
+        """
         self.only_subdomains = only_subdomains
         self.base_domain = start_domain
         if self.message_callback: # 使用 message_callback
@@ -839,6 +1175,36 @@ class DNSCacheTool:
         if self.message_callback: # 使用 message_callback
             self.message_callback(f"🧵 使用 {collect_threads} 个线程进行域名收集")
         
+        if export_format:
+            export_parts = [start_domain.replace('.', '_')]
+            if only_subdomains:
+                export_parts.append("仅子域名")
+            export_parts.append("收集时导出")
+            export_file = os.path.join(self.data_dir, f"{'-'.join(export_parts)}_{time.strftime('%Y%m%d%H%M')}.{export_format.lower()}")
+            try:
+                self.export_writer = DNSResultWriter(export_file, export_format)
+            except Exception as e:
+                self.export_writer = None
+                if self.message_callback:
+                    self.message_callback(f"创建导出文件失败: {e}")
+        
+        try:
+            self._run_collection(collect_threads)
+        finally:
+            if self.export_writer:
+                self.export_writer.close()
+                if self.message_callback:
+                    self.message_callback(f"结果已同步导出到: {self.export_writer.path}")
+                self.export_writer = None
+        
+        # 最终保存，更新域名数量
+        final_file_path = self.save_domains_to_file(final_save=True) # save_domains_to_file 将被重构以返回路径
+        if self.message_callback: # 使用 message_callback
+            self.message_callback(f"域名收集完成! 共收集了 {len(self.collected_domains)} 个域名")
+        return len(self.collected_domains), final_file_path
+
+    def _run_collection(self, collect_threads):
+        """使用线程池处理待访问域名，直到达到目标数量或没有新域名"""
         with ThreadPoolExecutor(max_workers=collect_threads) as executor:
             while self.domains_to_visit and len(self.collected_domains) < self.target_count:
                 # 取出一批域名进行处理
@@ -856,17 +1222,17 @@ class DNSCacheTool:
                 # 等待所有线程完成
                 for future in futures:
                     future.result()
-        
-        # 最终保存，更新域名数量
-        final_file_path = self.save_domains_to_file(final_save=True) # save_domains_to_file 将被重构以返回路径
-        if self.message_callback: # 使用 message_callback
-            self.message_callback(f"域名收集完成! 共收集了 {len(self.collected_domains)} 个域名")
-        return len(self.collected_domains), final_file_path
 
-    def batch_query_dns(self, file_path=None) -> tuple[int, int, dict | None]: # 添加了返回类型
-        """批量查询DNS以加快缓存。返回 (成功计数, 总计数, DNS结果字典)。"""
-        # load_domains_from_file 稍后将被重构
-        domains_to_query = self.load_domains_from_file(file_path) if file_path else self.collected_domains
+    def batch_query_dns(self, file_path=None, domains=None) -> tuple[int, int, dict | None]: # 添加了返回类型
+        """批量查询DNS以加快缓存。返回 (成功计数, 总计数, DNS结果字典)。
+
+        指定 domains 时只查询这些域名，file_path 仅用于记录来源文件（与 async_batch_query_dns 相同），
+        调用方已加载过文件时可避免再次读取和解析。
+        """
+        if domains is not None:
+            domains_to_query = domains
+        else:
+            domains_to_query = self.load_domains_from_file(file_path) if file_path else self.collected_domains
         
         if not domains_to_query:
             if self.message_callback: # 使用 message_callback
@@ -884,7 +1250,7 @@ class DNSCacheTool:
         
         if self.message_callback: # 使用 message_callback
             self.message_callback(f"开始查询 {len(domains_to_query)} 个域名的DNS...")
-            self.message_callback(f"注意: 查询速率限制为每秒最多{self.config.getint('DNS', 'QueriesPerSecond')}次查询")
+            self.message_callback(f"注意: 查询速率限制为每秒最多{self.config.qps}次查询")
 
         success_count = 0
         total_count = len(domains_to_query)
@@ -898,91 +1264,182 @@ class DNSCacheTool:
             
             for i in range(0, len(domains_list), batch_size):
                 batch = domains_list[i:i+batch_size]
+                # 缓存命中的域名直接使用缓存结果，不经过速率限制和网络查询
+                cached_results, batch_misses = self.resolve_cache.split(batch)
+                self.dns_results.update(cached_results)
+                success_count += len(cached_results)
+                
                 # query_dns 已被重构，将其结果存储在 self.dns_results 中
                 # 并返回一个布尔值表示成功。
-                future_results = [executor.submit(self.query_dns, domain) for domain in batch]
+                future_results = [executor.submit(self.query_dns, domain) for domain in batch_misses]
                 
                 batch_success_flags = [future.result() for future in future_results]
                 batch_success_count = sum(1 for flag in batch_success_flags if flag)
                 success_count += batch_success_count
+                for domain in batch_misses:
+                    self.resolve_cache.set(domain, self.dns_results[domain])
                 
                 processed_count = i + len(batch)
                 if self.progress_callback: # 使用 progress_callback
-                    progress_percentage = min(100, int(processed_count / total_count * 100)) if total_count > 0 else 0
-                    self.progress_callback(f"DNS查询进度: {progress_percentage}%", success_count, processed_count, total_count)
+                    self.progress_callback(ProgressKind.QUERY, success_count, processed_count, total_count)
         
         if self.message_callback: # 使用 message_callback
             self.message_callback(f"DNS查询完成! 成功查询了 {success_count}/{total_count} 个域名")
         
         return success_count, total_count, self.dns_results # 返回结果
 
+    async def async_batch_query_dns(self, file_path=None, concurrency=None, domains=None) -> tuple[int, int, dict | None]:
+        """使用asyncio批量查询DNS。返回值与 batch_query_dns 相同。
+
+        安装了 aiodns 时通过 c-ares 解析，否则回退到事件循环的 getaddrinfo。
+        concurrency 为同时进行的查询数上限，默认使用 DNS.MaxWorkers。
+        指定 domains 时只查询这些域名，file_path 仅用于记录来源文件。
+        """
+        if domains is not None:
+            domains_to_query = domains
+        else:
+            domains_to_query = self.load_domains_from_file(file_path) if file_path else self.collected_domains
+        
+        if not domains_to_query:
+            if self.message_callback:
+                self.message_callback("没有域名可供查询!")
+            return 0, 0, None
+        
+        self.current_source_file = file_path if file_path else None
+        self.dns_results = {}
+        
+        if self.message_callback:
+            self.message_callback(f"开始异步查询 {len(domains_to_query)} 个域名的DNS...")
+            self.message_callback(f"注意: 查询速率限制为每秒最多{self.config.qps}次查询")
+        
+        total_count = len(domains_to_query)
+        if concurrency is None:
+            concurrency = self.config.getint('DNS', 'MaxWorkers')
+        timeout = self.config.getfloat('DNS', 'Timeout')
+        batch_size = self.config.getint('DNS', 'BatchSize')
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        loop = asyncio.get_running_loop()
+        resolver = aiodns.DNSResolver(timeout=timeout, tries=1) if aiodns else None
+        counters = {'success': 0, 'processed': 0}
+        
+        async def resolve(domain):
+            result = self.resolve_cache.get(domain)
+            if result is None:
+                result = await resolve_uncached(domain)
+                self.resolve_cache.set(domain, result)
+            
+            self.dns_results[domain] = result
+            counters['processed'] += 1
+            if result['success']:
+                counters['success'] += 1
+            
+            processed_count = counters['processed']
+            if self.progress_callback and (processed_count % batch_size == 0 or processed_count == total_count):
+                self.progress_callback(ProgressKind.QUERY, counters['success'], processed_count, total_count)
+        
+        async def resolve_uncached(domain):
+            async with semaphore:
+                await self.rate_limiter.async_wait_if_needed()
+                result = {
+                    'domain': domain,
+                    'success': False,
+                    'ip_addresses': [],
+                    'timestamp': time.time(),
+                    'error': None,
+                    'ttl': None
+                }
+                try:
+                    if resolver:
+                        answer = await resolver.query_dns(domain, 'A')
+                        # 应答中可能包含 CNAME 记录，只取 A 记录的地址
+                        addresses = [record.data.addr for record in answer.answer if hasattr(record.data, 'addr')]
+                        if not addresses:
+                            raise LookupError("没有A记录")
+                        result['ip_addresses'] = list(dict.fromkeys(addresses))
+                        # CNAME 链中任一记录过期后结果都可能变化，取最小的TTL
+                        result['ttl'] = min(record.ttl for record in answer.answer)
+                    else:
+                        infos = await asyncio.wait_for(
+                            loop.getaddrinfo(domain, None, family=socket.AF_INET, type=socket.SOCK_STREAM),
+                            timeout
+                        )
+                        result['ip_addresses'] = list(dict.fromkeys(info[4][0] for info in infos))
+                    result['success'] = True
+                except Exception as e:
+                    result['error'] = str(e) or type(e).__name__
+                    if self.message_callback:
+                        self.message_callback(f"查询DNS时出错 (async): {domain}, 错误: {result['error']}", is_error=True)
+                return result
+        
+        try:
+            await asyncio.gather(*(resolve(domain) for domain in domains_to_query))
+        finally:
+            if resolver and hasattr(resolver, 'close'):
+                closing = resolver.close()
+                if asyncio.iscoroutine(closing):
+                    await closing
+        
+        success_count = counters['success']
+        if self.message_callback:
+            self.message_callback(f"DNS查询完成! 成功查询了 {success_count}/{total_count} 个域名")
+        
+        return success_count, total_count, self.dns_results
+
     # def ask_export_results(self): # 此方法已移除，CLI将处理此逻辑。
     #     """询问用户是否导出结果"""
     #     # ... (原始代码包含print和input) ...
 
-    def export_results(self, format_type: str) -> str | None: # 添加了返回类型
-        """导出DNS查询结果。返回导出的文件路径或None。"""
+    def export_results(self, format_type: str, path: str | None = None) -> str | None: # 添加了返回类型
+        """导出DNS查询结果。返回导出的文件路径或None。
+        
+        参数:
+            format_type (str): 导出格式，json 或 csv
+            path (str): 导出文件路径，为None时在数据目录中生成带时间戳的文件名
+        """
         if not self.dns_results:
             if self.message_callback: # 使用回调
                 self.message_callback("没有结果可导出!")
             return None # 返回None
         
-        timestamp = time.strftime("%Y%m%d%H%M")
+        format_type = format_type.lower()
+        if format_type not in ('json', 'csv'):
+            if self.message_callback: # 使用回调
+                self.message_callback(f"不支持的导出格式: {format_type}")
+            return None # 返回None
+        
+        if path is None:
+            path = os.path.join(self.data_dir, f"{self._export_base_name()}_{time.strftime('%Y%m%d%H%M')}.{format_type}")
+        
+        # 打开一次文件并逐条写出，不在内存中构建完整的导出内容
+        with DNSResultWriter(path, format_type, buffering=1 << 20) as writer:
+            for domain, result in self.dns_results.items():
+                writer.write(domain, result)
         
-        # 创建更有描述性的文件名
+        if self.message_callback: # 使用回调
+            self.message_callback(f"结果已导出到: {path}")
+        return path
+
+    def _export_base_name(self):
+        """根据结果来源生成描述性的导出文件名（不含时间戳和扩展名）"""
         filename_parts = []
-        successful_domains = [domain for domain, result in self.dns_results.items() if result['success']]
         
         # 添加源文件或域名信息
         # 直接访问属性，并确保属性存在或提供默认值
-        base_name_part = None
         if hasattr(self, 'base_domain') and self.base_domain: # 检查是否已设置 base_domain
-            base_name_part = self.base_domain.replace('.', '_')
-            filename_parts.append(base_name_part)
+            filename_parts.append(self.base_domain.replace('.', '_'))
             if hasattr(self, 'only_subdomains') and self.only_subdomains: # 检查是否已设置 only_subdomains
                 filename_parts.append("仅子域名")
         elif hasattr(self, 'current_source_file') and self.current_source_file: # 检查是否使用了源文件
-            source_filename = os.path.basename(self.current_source_file)
-            source_name = os.path.splitext(source_filename)[0]
+            source_name = Path(self.current_source_file).stem
             filename_parts.append(f"来源_{source_name}")
         
         # 添加成功查询数量信息
-        if successful_domains: # 仅当有成功域名时添加
-            filename_parts.append(f"{len(successful_domains)}个成功DNS结果")
+        success_count = sum(1 for result in self.dns_results.values() if result['success'])
+        if success_count: # 仅当有成功域名时添加
+            filename_parts.append(f"{success_count}个成功DNS结果")
         
         # 合并所有部分
-        descriptive_name = "-".join(filename_parts) if filename_parts else "dns_results"
-        
-        if format_type.lower() == 'json':
-            # 导出为JSON，只包含域名列表
-            export_file = os.path.join(self.data_dir, f"{descriptive_name}_{timestamp}.json")
-            with open(export_file, 'w', encoding='utf-8') as f:
-                json.dump(successful_domains, f, ensure_ascii=False, indent=2)
-                
-        elif format_type.lower() == 'csv':
-            # 导出为CSV
-            export_file = os.path.join(self.data_dir, f"{descriptive_name}_{timestamp}.csv")
-            with open(export_file, 'w', encoding='utf-8', newline='') as f:
-                csv_writer = csv.writer(f)
-                # 写入表头
-                csv_writer.writerow(['域名', '解析状态', 'IP地址'])
-                
-                # 写入数据
-                for domain, result in self.dns_results.items():
-                    ip_addresses = ';'.join(result['ip_addresses']) if result['ip_addresses'] else ''
-                    csv_writer.writerow([
-                        domain,
-                        '成功' if result['success'] else '失败',
-                        ip_addresses
-                    ])
-        else:
-            if self.message_callback: # 使用回调
-                self.message_callback(f"不支持的导出格式: {format_type}")
-            return None # 返回None
-        
-        if self.message_callback: # 使用回调
-            self.message_callback(f"结果已导出到: {export_file}")
-        return export_file
+        return "-".join(filename_parts) if filename_parts else "dns_results"
 
     def save_domains_to_file(self, final_save=False) -> str | None: # 添加了返回类型
         """保存域名列表到文件。返回文件路径或None。
@@ -1021,23 +1478,28 @@ class DNSCacheTool:
             # 完整文件名
             new_file = os.path.join(self.data_dir, f"{descriptive_name}_{timestamp}.json")
             
-            if self.current_file and self.current_file != new_file and os.path.exists(self.current_file):
-                if final_save:
-                    try:
-                        os.remove(self.current_file)
-                        if self.message_callback: # 使用回调
-                            self.message_callback(f"已删除旧文件: {self.current_file}")
-                    except Exception as e:
-                        if self.message_callback: # 使用回调
-                            self.message_callback(f"删除旧文件时出错: {e}")
+            if final_save and self.current_file and self.current_file != new_file:
+                try:
+                    os.remove(self.current_file)
+                    if self.message_callback: # 使用回调
+                        self.message_callback(f"已删除旧文件: {self.current_file}")
+                except FileNotFoundError:
+                    pass # 旧文件已不存在，无需删除
+                except Exception as e:
+                    if self.message_callback: # 使用回调
+                        self.message_callback(f"删除旧文件时出错: {e}")
             
             self.current_file = new_file
         
-        domains_data = list(self.collected_domains)
-        
         try: # 为文件操作添加try-except
-            with open(self.current_file, 'w', encoding='utf-8') as f:
-                json.dump(domains_data, f, ensure_ascii=False, indent=2)
+            with open(self.current_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
+                # 逐个写出域名，不复制整个集合，输出格式与 json.dump(indent=2) 相同
+                separator = '\n  '
+                f.write('[')
+                for domain in self.collected_domains:
+                    f.write(separator + json.dumps(domain, ensure_ascii=False))
+                    separator = ',\n  '
+                f.write('\n]')
             if self.message_callback: # 使用回调
                 self.message_callback(f"域名已保存到文件: {self.current_file}")
             return self.current_file
@@ -1124,25 +1586,48 @@ class DNSCacheTool:
     #     """导入域名列表"""
     #     # ... (原始的CLI密集型代码在此) ...
 
+    def sweep_stale_temp_files(self, max_age=3600) -> int:
+        """删除数据目录中旧版本性能测试遗留的临时域名文件（超过 max_age 秒未修改）。返回删除的文件数。"""
+        cutoff = time.time() - max_age
+        removed = 0
+        try:
+            with os.scandir(self.data_dir) as entries:
+                for entry in entries:
+                    file_name = entry.name
+                    if not (file_name == "temp_test_domains.json" or
+                            (file_name.startswith("temp_perf_test_domains_") and file_name.endswith(".json"))):
+                        continue
+                    try:
+                        if entry.is_file() and entry.stat().st_mtime < cutoff and _best_effort_unlink(entry.path):
+                            removed += 1
+                    except OSError:
+                        pass # 文件可能已被删除或无权限，跳过
+        except OSError:
+            return 0
+        if removed and self.message_callback:
+            self.message_callback(f"已清理 {removed} 个过期的临时域名文件")
+        return removed
+
     def get_available_files(self) -> list[str]: # 添加了返回类型
         """获取可用的域名文件列表。返回文件路径列表。"""
-        if not os.path.exists(self.data_dir): # 处理不存在的data_dir
+        files = []
+        try:
+            with os.scandir(self.data_dir) as entries: # scandir 直接提供路径和文件类型，无需额外stat
+                for entry in entries:
+                    file_name = entry.name
+                    if not entry.is_file():
+                        continue
+                    if (file_name.startswith("domains_") and file_name.endswith(".json")) or \
+                       (file_name.startswith("dns_results_") and (file_name.endswith(".json") or file_name.endswith(".csv"))):
+                        files.append(entry.path)
+        except FileNotFoundError: # 处理不存在的data_dir
             try:
-                os.makedirs(self.data_dir)
+                os.makedirs(self.data_dir, exist_ok=True)
                 if self.message_callback:
                     self.message_callback(f"数据目录 {self.data_dir} 不存在，已创建。")
-                return [] # 返回空列表，因为目录刚创建
             except Exception as e:
                 if self.message_callback:
                     self.message_callback(f"创建数据目录 {self.data_dir} 失败: {e}")
-                return [] # 出错时返回空列表
-
-        files = []
-        try:
-            for file_name in os.listdir(self.data_dir): # 将 'file' 重命名为 'file_name'
-                if (file_name.startswith("domains_") and file_name.endswith(".json")) or \
-                   (file_name.startswith("dns_results_") and (file_name.endswith(".json") or file_name.endswith(".csv"))):
-                    files.append(os.path.join(self.data_dir, file_name))
         except Exception as e:
             if self.message_callback:
                 self.message_callback(f"列出数据目录 {self.data_dir} 中的文件时出错: {e}")
@@ -1162,40 +1647,84 @@ class DNSCacheTool:
 
 # --- CLI特定函数 --- # 用于CLI交互的新区域
 
+# 主菜单中反复输出的固定文本，在导入时按stdout的编码预先编码一次
+_STDOUT_ENCODING = getattr(sys.stdout, 'encoding', None) or 'utf-8'
+_MENU_TEXT = (
+    "\n" + "="*50 + "\n"
+    "🌐 DNS缓存工具 🚀 (CLI Mode)\n"
+    + "="*50 + "\n"
+    "1. 🔍 从新域名开始收集\n"
+    "2. 🔄 使用已有域名文件查询DNS\n"
+    "3. 📥 导入域名列表\n"
+    "4. 📤 导出上次查询结果\n"
+    "5. ⚙️ 配置设置\n"
+    "6. 🚀 运行性能测试\n"
+    "7. 👋 退出\n"
+)
+_MENU_B = _MENU_TEXT.encode(_STDOUT_ENCODING, errors='replace')
+_INVALID_B = "❌ 无效的选择! 请重试。\n".encode(_STDOUT_ENCODING, errors='replace')
+_BYE_B = "👋 感谢使用! 再见!\n".encode(_STDOUT_ENCODING, errors='replace')
+
+def _write_bytes(data: bytes):
+    """将预编码的文本直接写入stdout的底层缓冲区，跳过文本层的编码"""
+    buffer = getattr(sys.stdout, 'buffer', None)
+    if buffer is None: # stdout被替换为没有底层缓冲区的对象时退回到print
+        print(data.decode(_STDOUT_ENCODING), end='')
+        return
+    sys.stdout.flush() # 先写出文本层中尚未输出的内容，保证输出顺序
+    buffer.write(data)
+    buffer.flush()
+
+def _getch() -> str:
+    """读取单个按键而无需等待回车。"""
+    try:
+        import msvcrt
+    except ImportError:
+        import termios
+        import tty
+        fd = sys.stdin.fileno()
+        old_settings = termios.tcgetattr(fd)
+        try:
+            tty.setcbreak(fd)
+            return sys.stdin.read(1)
+        finally:
+            termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
+    return msvcrt.getwch()
+
 def cli_edit_config(tool: DNSCacheTool): # 从DNSCacheTool.edit_config改编的新函数
     """CLI: 编辑配置"""
     while True:
         print("\n" + "="*50)
-            print("⚙️ 配置设置")
-            print("="*50)
-            
-            sections = tool.config.config.sections() # 使用tool.config
-            for i, section_key in enumerate(sections, 1): # 遍历键
-                section_name = tool.config.get_name(section_key) # 获取翻译后的名称
-                icon = ""
-                if section_key == 'General': icon = "🔧"
-                elif section_key == 'DNS': icon = "🌐"
-                elif section_key == 'Crawler': icon = "🕸️"
-                elif section_key == 'Export': icon = "📤"
-                else: icon = "📝"
-                print(f"{i}. {icon} {section_name if section_name != section_key else section_key}")
-            print(f"{len(sections)+1}. 💾 保存并返回")
+        print("⚙️ 配置设置")
+        print("="*50)
+        
+        sections = tool.config.config.sections() # 使用tool.config
+        for i, section_key in enumerate(sections, 1): # 遍历键
+            section_name = tool.config.get_name(section_key) # 获取翻译后的名称
+            icon = ""
+            if section_key == 'General': icon = "🔧"
+            elif section_key == 'DNS': icon = "🌐"
+            elif section_key == 'Crawler': icon = "🕸️"
+            elif section_key == 'Export': icon = "📤"
+            else: icon = "📝"
+            print(f"{i}. {icon} {section_name if section_name != section_key else section_key}")
+        print(f"{len(sections)+1}. 💾 保存并返回")
+        
+        try:
+            choice = int(input("\n请选择要编辑的部分: "))
             
-            try:
-                choice = int(input("\n请选择要编辑的部分: "))
-                
-                if 1 <= choice <= len(sections):
-                    section_key_selected = sections[choice-1] # 获取选定的键
-                    cli_edit_section(tool, section_key_selected) # 调用新的CLI特定函数
-                elif choice == len(sections)+1:
-                    success, msg = tool.config.save_config() # 使用Config类的方法
-                    if tool.message_callback: tool.message_callback(msg)
-                    else: print(msg)
-                    break
-                else:
-                    print("❌ 无效的选择!")
-            except ValueError:
-                print("❌ 请输入有效的数字!")
+            if 1 <= choice <= len(sections):
+                section_key_selected = sections[choice-1] # 获取选定的键
+                cli_edit_section(tool, section_key_selected) # 调用新的CLI特定函数
+            elif choice == len(sections)+1:
+                success, msg = tool.config.save_config() # 使用Config类的方法
+                if tool.message_callback: tool.message_callback(msg)
+                else: print(msg)
+                break
+            else:
+                print("❌ 无效的选择!")
+        except ValueError:
+            print("❌ 请输入有效的数字!")
 
 def cli_edit_section(tool: DNSCacheTool, section_key: str): # 从DNSCacheTool.edit_section改编的新函数
     """CLI: 编辑特定配置部分"""
@@ -1246,26 +1775,15 @@ def cli_run_performance_test(tool: DNSCacheTool): # 从DNSCacheTool.run_performa
     
     use_current_domains = False
     test_file_for_perf_test = None 
+    test_domains_for_perf_test = None
     
     if tool.collected_domains:
         while True:
             choice = input(f"是否使用当前已收集的 {len(tool.collected_domains)} 个域名进行测试？(y/n): ")
             if choice.lower() in ['y', 'yes', '是', '是的']:
                 use_current_domains = True
-                
-                temp_file_path = os.path.join(tool.data_dir, "temp_test_domains.json")
-                try:
-                    with open(temp_file_path, 'w', encoding='utf-8') as f:
-                        json.dump(list(tool.collected_domains), f)
-                    test_file_for_perf_test = temp_file_path
-                    msg = f"已将当前域名保存到临时文件: {test_file_for_perf_test}"
-                    if tool.message_callback: tool.message_callback(msg)
-                    else: print(msg)
-                except Exception as e:
-                    msg = f"保存临时域名文件失败: {e}"
-                    if tool.message_callback: tool.message_callback(msg)
-                    else: print(msg)
-                    test_file_for_perf_test = None 
+                # 直接将域名列表传给测试器，无需写入临时文件
+                test_domains_for_perf_test = list(tool.collected_domains)
                 break
             elif choice.lower() in ['n', 'no', '否', '不']:
                 break
@@ -1277,7 +1795,7 @@ def cli_run_performance_test(tool: DNSCacheTool): # 从DNSCacheTool.run_performa
         if available_files:
             print("\n📂 可以使用的域名文件:")
             for i, file_path_available in enumerate(available_files, 1):
-                print(f"{i}. {os.path.basename(file_path_available)}")
+                print(f"{i}. {Path(file_path_available).name}")
             print(f"{len(available_files)+1}. 使用默认测试域名")
             
             while True:
@@ -1299,7 +1817,7 @@ def cli_run_performance_test(tool: DNSCacheTool): # 从DNSCacheTool.run_performa
             print("沒有可用的域名文件，将使用默认测试域名 (由DNSPerformanceTester内部加载)")
             test_file_for_perf_test = None
 
-    tester = DNSPerformanceTester(test_file_for_perf_test, "test_results", tool.config)
+    tester = DNSPerformanceTester(test_file_for_perf_test, "test_results", tool.config, test_domains=test_domains_for_perf_test)
     run_test_results = tester.run_tests() 
     
     if run_test_results:
@@ -1354,17 +1872,6 @@ def cli_run_performance_test(tool: DNSCacheTool): # 从DNSCacheTool.run_performa
         else:
             print("性能测试未能生成最佳参数。")
 
-
-    if use_current_domains and test_file_for_perf_test and os.path.exists(test_file_for_perf_test):
-        try:
-            os.remove(test_file_for_perf_test)
-            msg_deleted_temp = f"已删除临时文件: {test_file_for_perf_test}"
-            if tool.message_callback: tool.message_callback(msg_deleted_temp)
-            else: print(msg_deleted_temp)
-        except Exception as e:
-            msg_err_delete_temp = f"删除临时文件时出错: {e}"
-            if tool.message_callback: tool.message_callback(msg_err_delete_temp)
-            else: print(msg_err_delete_temp)
     
     input("\n按Enter键返回主菜单...")
 
@@ -1396,6 +1903,38 @@ def cli_ask_export_results(tool: DNSCacheTool): # 从DNSCacheTool.ask_export_res
         else:
             print("无效的选择! 请重试。")
 
+def cli_query_with_cache(tool: DNSCacheTool, file_path: str) -> tuple[int, int, dict | None]:
+    """CLI: 查询文件中的域名，跳过本地持久化缓存中未过期的域名。返回值与 batch_query_dns 相同。"""
+    cache = DNSResultCache(
+        os.path.join(tool.data_dir, ".dnscache.json"),
+        ttl=tool.config.cache_ttl
+    )
+    domains = tool.load_domains_from_file(file_path)
+    if not domains:
+        return 0, 0, None
+    
+    hits, misses = cache.split(domains)
+    if hits:
+        msg = f"⚡ {len(hits)} 个域名命中本地DNS缓存，跳过查询"
+        if tool.message_callback: tool.message_callback(msg)
+        else: print(msg)
+    
+    success_count = 0
+    if misses:
+        success_count, _, new_results = asyncio.run(tool.async_batch_query_dns(file_path, domains=misses))
+        for domain, result in (new_results or {}).items():
+            cache.set(domain, result)
+        saved, msg = cache.save()
+        if not saved:
+            if tool.message_callback: tool.message_callback(msg)
+            else: print(msg)
+    else:
+        tool.current_source_file = file_path
+        tool.dns_results = {}
+    
+    tool.dns_results.update(hits)
+    return success_count + len(hits), len(domains), tool.dns_results
+
 def cli_import_domains(tool: DNSCacheTool): # 从DNSCacheTool.import_domains改编的新函数
     """CLI: 导入域名列表"""
     print("\n📥 导入域名列表")
@@ -1403,12 +1942,7 @@ def cli_import_domains(tool: DNSCacheTool): # 从DNSCacheTool.import_domains改
     
     file_path_to_import = input("请输入文件路径: ") 
     
-    if not os.path.exists(file_path_to_import):
-        msg = "❌ 文件不存在!"
-        if tool.message_callback: tool.message_callback(msg)
-        else: print(msg)
-        return
-    
+    # 不预先检查文件是否存在：load_domains_from_file 打开失败时会报告"文件未找到"并返回空集合
     domains = tool.load_domains_from_file(file_path_to_import)
     if domains:
         msg_success_import = f"✅ 成功导入 {len(domains)} 个域名"
@@ -1416,42 +1950,34 @@ def cli_import_domains(tool: DNSCacheTool): # 从DNSCacheTool.import_domains改
         else: print(msg_success_import)
         
         if input("\n是否对这些域名进行DNS查询? (y/n): ").lower() == 'y':
-            success_count, total_count, dns_results_data = tool.batch_query_dns(file_path_to_import) 
+            success_count, total_count, dns_results_data = tool.batch_query_dns(file_path_to_import, domains=domains) 
             if dns_results_data: 
                  cli_ask_export_results(tool)
 
 
 # --- 主CLI循环 ---
-def main_cli(): # 将main重命名为main_cli
+def main_cli(clean_exit=False): # 将main重命名为main_cli
+    """CLI主循环。clean_exit为True时退出走正常的解释器关闭流程（便于调试和性能分析）。"""
     # 用于CLI的简单进度和消息回调
-    def cli_progress_handler(message, current, *args): 
-        if not args:
-             print(f"{message}: {current}")
-        elif len(args) == 1: 
-            total = args[0]
-            print(f"{message} [{current}/{total}]")
-        elif len(args) == 2: 
-             processed_count, total_domains = args
-             print(f"{message} (成功:{current}/已处理:{processed_count}/总数:{total_domains})")
-
-
-    def cli_message_handler(message):
+    def cli_progress_handler(kind, *args):
+        if kind == ProgressKind.COLLECT:
+            domain, current, total = args
+            print(f"正在处理域名: {domain} [{current}/{total}]")
+        elif kind == ProgressKind.QUERY:
+            success_count, processed_count, total_domains = args
+            progress_percentage = min(100, processed_count * 100 // total_domains) if total_domains > 0 else 0
+            print(f"DNS查询进度: {progress_percentage}% (成功:{success_count}/已处理:{processed_count}/总数:{total_domains})")
+
+
+    def cli_message_handler(message, is_error=False):
         print(message)
 
     tool = DNSCacheTool(progress_callback=cli_progress_handler, message_callback=cli_message_handler)
+    tool.sweep_stale_temp_files()
     
     
     while True:
-        print("\n" + "="*50)
-        print("🌐 DNS缓存工具 🚀 (CLI Mode)")
-        print("="*50)
-        print("1. 🔍 从新域名开始收集")
-        print("2. 🔄 使用已有域名文件查询DNS")
-        print("3. 📥 导入域名列表")
-        print("4. 📤 导出上次查询结果")
-        print("5. ⚙️ 配置设置")
-        print("6. 🚀 运行性能测试")
-        print("7. 👋 退出")
+        _write_bytes(_MENU_B)
         
         cli_choice = input("\n请选择操作: ") 
         
@@ -1464,9 +1990,14 @@ def main_cli(): # 将main重命名为main_cli
             only_subdomains_choice = input(f"是否只收集 {start_domain} 的子域名? (y/n): ").lower()
             only_subdomains = only_subdomains_choice == 'y'
             
+            export_choice = input("是否在收集时同步导出DNS结果? (json/csv, 直接回车跳过): ").strip().lower()
+            export_format = export_choice if export_choice in ('json', 'csv') else None
+            
             tool.current_file = None 
-            collected_count, final_file_path = tool.collect_domains(start_domain, only_subdomains)
+            collected_count, final_file_path = tool.collect_domains(start_domain, only_subdomains, export_format=export_format)
             # 关于收集和保存的消息由回调处理
+            if collected_count and not export_format and input("\n是否立即导出DNS结果? (y/n): ").lower() == 'y':
+                cli_ask_export_results(tool)
         
         elif cli_choice == '2':
             available_files = tool.get_available_files() 
@@ -1476,13 +2007,20 @@ def main_cli(): # 将main重命名为main_cli
             
             print("\n📂 可用的文件:")
             for i, file_path_option in enumerate(available_files, 1): 
-                print(f"{i}. {os.path.basename(file_path_option)}")
+                print(f"{i}. {Path(file_path_option).name}")
             
             try:
-                file_index = int(input("\n请选择文件 (输入序号): ")) - 1
+                if len(available_files) <= 9 and sys.stdin.isatty():
+                    # 文件不超过9个时按一个数字键即可选择
+                    print(f"\n请按数字键选择文件 (1-{len(available_files)}): ", end='', flush=True)
+                    key = _getch()
+                    print(key)
+                    file_index = ord(key) - ord('1') if len(key) == 1 else -1
+                else:
+                    file_index = int(input("\n请选择文件 (输入序号): ")) - 1
                 if 0 <= file_index < len(available_files):
                     selected_file = available_files[file_index]
-                    success_count, total_count, dns_results_data = tool.batch_query_dns(selected_file)
+                    success_count, total_count, dns_results_data = cli_query_with_cache(tool, selected_file)
                     if dns_results_data: 
                         cli_ask_export_results(tool) 
                 else:
@@ -1503,11 +2041,17 @@ def main_cli(): # 将main重命名为main_cli
             cli_run_performance_test(tool) 
         
         elif cli_choice == '7':
-            print("👋 感谢使用! 再见!")
-            break
+            _write_bytes(_BYE_B)
+            if clean_exit:
+                break
+            # 所有线程池在各自的 with 块结束时已关闭，缓存和域名文件也已写入，
+            # 直接结束进程以跳过解释器关闭时的模块清理
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(0)
         
         else:
-            print("❌ 无效的选择! 请重试。")
+            _write_bytes(_INVALID_B)
 
 if __name__ == "__main__":
-    main_cli() # 调用新的CLI主函数
+    main_cli(clean_exit='--clean-exit' in sys.argv[1:]) # 调用新的CLI主函数
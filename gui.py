@@ -1,13 +1,103 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, filedialog, messagebox
-import threading # MOD: 已添加 threading 导入
-import os # MOD: 添加 os 模块导入，用于 os.path.basename
-import time # MOD: 添加 time 模块导入，用于生成临时文件名
-import json # MOD: 添加 json 模块导入，用于保存临时文件
-import shutil # MOD: 添加 shutil 模块导入，用于复制文件
+import os # MOD: 添加 os 模块导入，用于路径处理
+import time # MOD: 添加 time 模块导入，用于节流和时间戳
+import collections
+import functools
+from pathlib import Path
+import queue
+import re
+import stat
+from concurrent.futures import ThreadPoolExecutor
 
 # MOD: 导入后端类
-from dns_cache_tool import DNSCacheTool, Config, DNSRateLimiter # MOD: 已添加 DNSRateLimiter
+from dns_cache_tool import DNSCacheTool, DNSPerformanceTester, Config, ProgressKind, RESOLVE_CACHE_TTL
+
+UI_POLL_INTERVAL_MS = 50 # 轮询后台线程界面更新请求的间隔（不支持文件事件的平台，如Windows）
+UI_QUEUE_BATCH = 200 # 每次最多处理的界面更新请求数
+LOG_FLUSH_INTERVAL_MS = 100 # 日志区域批量刷新的间隔
+STATUS_FLUSH_INTERVAL_MS = 100 # 进度更新状态栏的最小间隔
+DISPLAY_MIN_INTERVAL = 0.25 # 进度写入日志区域的最小间隔(秒)
+LOG_MAX_LINES = 5000 # 日志区域保留的最大行数
+LOG_TRIM_LINES = 1000 # 超出上限时一次删除的旧行数
+PERF_OUTPUT_MAX_ROWS = 10000 # 性能测试输出表格保留的最大行数
+STATUS_MESSAGE_RE = re.compile('完成|已保存') # 需要同时显示在状态栏中的关键成功消息
+DOMAIN_FILETYPES = (("JSON 文件", "*.json"), ("文本文件", "*.txt"), ("CSV 文件", "*.csv"), ("所有文件", "*.*")) # 打开域名文件的类型
+EXPORT_FILETYPES = (("JSON 文件", "*.json"), ("CSV 文件", "*.csv")) # 导出DNS结果的类型
+EXPORT_FORMATS = {"JSON 文件": "json", "CSV 文件": "csv"} # 导出类型名称 -> export_results 的格式
+EXPORT_SUFFIXES = {".json": "json", ".csv": "csv"} # 导出文件扩展名 -> export_results 的格式
+
+def append_lines_to_log(text_widget, lines):
+    """一次性将多行文本追加到只读的日志区域，并删除超出上限的旧行"""
+    follow = text_widget.yview()[1] >= 0.99 # 仅当视图位于底部时自动滚动，查看历史记录时不打断
+    text_widget.configure(state='normal')
+    text_widget.insert(tk.END, "\n".join(lines) + "\n")
+    line_count = int(text_widget.index('end-1c').split('.')[0])
+    if line_count > LOG_MAX_LINES:
+        text_widget.delete('1.0', f'{LOG_TRIM_LINES + 1}.0')
+    if follow:
+        text_widget.see(tk.END)
+    text_widget.configure(state='disabled')
+
+class CoalescedFlush:
+    """将多次刷新请求合并为一次：每个 delay_ms 周期最多在主线程中执行一次 flush()。
+
+    request() 可在任意线程中调用，通过 post（如 App.post_to_ui）回到主线程后再用 after 延迟执行。
+    flush 执行前先清除标记，调用方先写入数据再调用 request()，因此不会遗漏数据。
+    """
+    def __init__(self, widget, post, delay_ms, flush):
+        self._widget = widget
+        self._post = post
+        self._delay_ms = delay_ms
+        self._flush = flush
+        self._pending = False
+
+    def request(self):
+        if not self._pending:
+            self._pending = True
+            self._post(self._schedule)
+
+    def _schedule(self):
+        if self._widget.winfo_exists():
+            self._widget.after(self._delay_ms, self._run)
+
+    def _run(self):
+        self._pending = False
+        if self._widget.winfo_exists():
+            self._flush()
+
+class ConfirmDialog(tk.Toplevel):
+    """是/否确认对话框，通过回调返回结果，不运行嵌套的事件循环"""
+    def __init__(self, parent, title, message, on_yes, on_no=None):
+        super().__init__(parent)
+        self.transient(parent)
+        self.title(title)
+        self.resizable(False, False)
+        self.result = None # 用户点击后为 True/False，直接关闭窗口时保持 None
+        self._on_yes = on_yes
+        self._on_no = on_no
+
+        ttk.Label(self, text=message, wraplength=360, padding="15").pack(fill=tk.X)
+
+        buttons_frame = ttk.Frame(self, padding="10")
+        buttons_frame.pack(fill=tk.X)
+        ttk.Button(buttons_frame, text="否", command=lambda: self._finish(False)).pack(side=tk.RIGHT, padx=5)
+        yes_button = ttk.Button(buttons_frame, text="是", command=lambda: self._finish(True))
+        yes_button.pack(side=tk.RIGHT, padx=5)
+        yes_button.focus_set()
+
+        self.bind('<Return>', lambda event: self._finish(True))
+        self.bind('<Escape>', lambda event: self._finish(False))
+        self.protocol("WM_DELETE_WINDOW", lambda: self._finish(False))
+        self.grab_set()
+
+    def _finish(self, result):
+        self.result = result
+        self.grab_release()
+        self.destroy()
+        callback = self._on_yes if result else self._on_no
+        if callback:
+            callback()
 
 class ConfigEditorDialog(tk.Toplevel):
     def __init__(self, parent, config_instance: Config, dns_tool_instance: DNSCacheTool):
@@ -19,30 +109,30 @@ class ConfigEditorDialog(tk.Toplevel):
         self.parent = parent # 用于访问 App 类的方法，如 gui_message_callback
         self.config_instance = config_instance
         self.dns_tool_instance = dns_tool_instance
-        self.entry_widgets = [] # 用于存储 (entry_widget, section, option_key) 的列表
-
-        notebook = ttk.Notebook(self)
+        # 输入框变量及其所属的节和选项，按下标一一对应；同时保留变量的引用，变量被回收会使 trace 失效
+        self._vars: list[tk.Variable] = []
+        self._sections: list[str] = []
+        self._options: list[str] = []
+        # 每个输入框最近一次的有效输入。修改只记录在这里，保存时才一次性写入配置，
+        # 后台正在运行的收集或查询不会读到输入到一半或之后被取消的值
+        self._staged: list[str] = []
+        self._populating = False # 为 True 时输入框变量的写入不记录为修改
+
+        self.notebook = ttk.Notebook(self)
+        self._pending_tabs = {} # 尚未创建控件的标签页: 框架路径 -> (section_key, 框架)
         
-        sections = self.config_instance.config.sections()
-        for section_key in sections:
-            section_frame = ttk.Frame(notebook, padding="10")
-            notebook.add(section_frame, text=self.config_instance.get_name(section_key)) # 使用get_name获取中文节名
-
-            options = self.config_instance.config.options(section_key)
-            for i, option_key in enumerate(options):
-                option_name = self.config_instance.get_name(option_key) # 使用get_name获取中文选项名
-                current_value = self.config_instance.get(section_key, option_key)
-                
-                ttk.Label(section_frame, text=f"{option_name}:").grid(row=i, column=0, padx=5, pady=5, sticky=tk.W)
-                
-                entry_var = tk.StringVar(value=current_value)
-                entry = ttk.Entry(section_frame, textvariable=entry_var, width=50)
-                entry.grid(row=i, column=1, padx=5, pady=5, sticky=tk.EW)
-                
-                self.entry_widgets.append((entry_var, section_key, option_key))
-            section_frame.columnconfigure(1, weight=1) # 使输入框可扩展
+        # 打开对话框时的配置快照，保存时与之比较找出修改过的选项
+        self._original = self._snapshot_config()
+        
+        # 标签页的控件在首次切换到该页时才创建，未查看的配置节保持原值
+        for section_key in self._original:
+            section_frame = ttk.Frame(self.notebook, padding="10")
+            self.notebook.add(section_frame, text=self.config_instance.get_name(section_key)) # 使用get_name获取中文节名
+            self._pending_tabs[str(section_frame)] = (section_key, section_frame)
+        self.notebook.bind('<<NotebookTabChanged>>', self._materialize_tab)
+        self._materialize_tab() # 立即创建默认选中的第一页
             
-        notebook.pack(expand=True, fill="both", padx=10, pady=10)
+        self.notebook.pack(expand=True, fill="both", padx=10, pady=10)
 
         # 按钮框架
         buttons_frame = ttk.Frame(self, padding="10")
@@ -51,42 +141,140 @@ class ConfigEditorDialog(tk.Toplevel):
         save_button = ttk.Button(buttons_frame, text="保存", command=self.save_configuration)
         save_button.pack(side=tk.RIGHT, padx=5)
 
-        cancel_button = ttk.Button(buttons_frame, text="取消", command=self.destroy)
+        cancel_button = ttk.Button(buttons_frame, text="取消", command=self.cancel)
         cancel_button.pack(side=tk.RIGHT, padx=5)
         
-        self.protocol("WM_DELETE_WINDOW", self.destroy) # 处理窗口关闭按钮
+        self.protocol("WM_DELETE_WINDOW", self.cancel) # 处理窗口关闭按钮
         self.geometry("600x400") # 根据需要调整大小
 
-    def save_configuration(self):
+    def _snapshot_config(self):
+        config = self.config_instance.config
+        return {s: dict(config.items(s, raw=True)) for s in config.sections()}
+
+    def show(self):
+        """再次打开已隐藏的对话框：复用现有控件，只将输入框刷新为当前配置"""
+        self._populate_from_config()
+        self.deiconify()
+        self.lift()
+        self.grab_set()
+
+    def _populate_from_config(self):
+        self._original = self._snapshot_config()
+        self._populating = True
         try:
-            for entry_var, section, option in self.entry_widgets:
-                new_value = entry_var.get()
-                self.config_instance.set(section, option, new_value)
+            for index, (var, section, option) in enumerate(zip(self._vars, self._sections, self._options)):
+                self._staged[index] = self._original[section][option]
+                var.set(self._staged[index])
+        finally:
+            self._populating = False
+
+    def _close(self):
+        # 只隐藏窗口，下次打开时不再重新创建控件
+        self.grab_release()
+        self.withdraw()
+
+    def _materialize_tab(self, event=None):
+        pending = self._pending_tabs.pop(self.notebook.select(), None)
+        if pending:
+            self._build_section_tab(*pending)
+
+    def _build_section_tab(self, section_key, section_frame):
+        # 直接使用打开对话框时的快照，不再逐项经过 configparser 查找
+        for i, (option_key, current_value) in enumerate(self._original[section_key].items()):
+            option_name = self.config_instance.get_name(option_key) # 使用get_name获取中文选项名
             
-            success, message = self.config_instance.save_config()
+            ttk.Label(section_frame, text=f"{option_name}:").grid(row=i, column=0, padx=5, pady=5, sticky=tk.W)
             
-            if success:
-                # 使用新设置更新 DNSCacheTool 实例
-                self.dns_tool_instance.target_count = self.config_instance.getint('General', 'TargetCount')
-                # 使用新值重新初始化速率限制器
-                self.dns_tool_instance.rate_limiter = DNSRateLimiter(
-                    queries_per_second=self.config_instance.getint('DNS', 'QueriesPerSecond')
-                )
-                # DNSCacheTool 的 self.config 是同一个实例，因此它会自动看到其他直接 get 的更改。
-                # 如果 DNSCacheTool 在其自己的属性中更广泛地缓存了配置值，请在此处更新它们。
+            value_type = self.config_instance.get_type(section_key, option_key)
+            entry_var, entry = self._create_input(section_frame, value_type, current_value)
+            index = len(self._vars)
+            entry_var.trace_add('write', lambda *_, index=index: self._on_entry_write(index))
+            if not isinstance(entry, ttk.Checkbutton):
+                entry.bind('<FocusOut>', lambda event, index=index: self._revalidate_entry(index))
+            entry.grid(row=i, column=1, padx=5, pady=5, sticky=tk.W if isinstance(entry, ttk.Checkbutton) else tk.EW)
+            
+            self._vars.append(entry_var)
+            self._sections.append(section_key)
+            self._options.append(option_key)
+            self._staged.append(current_value)
+        section_frame.columnconfigure(1, weight=1) # 使输入框可扩展
+
+    def _create_input(self, parent, value_type, current_value):
+        """按选项类型创建变量和输入控件；当前值无法按类型解析时退回文本输入框"""
+        try:
+            if value_type is bool:
+                var = tk.BooleanVar(value=self.config_instance.config.BOOLEAN_STATES[current_value.lower()])
+                return var, ttk.Checkbutton(parent, variable=var)
+            if value_type is int:
+                var = tk.IntVar(value=int(current_value))
+                return var, ttk.Spinbox(parent, textvariable=var, from_=0, to=10**9, increment=1, width=48)
+            if value_type is float:
+                var = tk.DoubleVar(value=float(current_value))
+                return var, ttk.Spinbox(parent, textvariable=var, from_=0, to=10**6, increment=0.5, width=48)
+        except (KeyError, ValueError):
+            pass
+        var = tk.StringVar(value=current_value)
+        return var, ttk.Entry(parent, textvariable=var, width=50)
+
+    def _on_entry_write(self, index):
+        if self._populating:
+            return
+        try:
+            value = self._vars[index].get()
+        except (tk.TclError, ValueError):
+            return # 输入尚未构成有效数值，保留上一个有效值
+        if isinstance(value, bool):
+            value = 'true' if value else 'false'
+        self._staged[index] = str(value)
+
+    def _revalidate_entry(self, index):
+        """输入框失去焦点时，若内容不是有效数值则恢复为上一个有效值"""
+        try:
+            self._vars[index].get()
+        except (tk.TclError, ValueError):
+            self._vars[index].set(self._staged[index])
 
+    def save_configuration(self):
+        # 与打开对话框时的快照比较，没有修改时不重写配置文件
+        changes = {}
+        for section, option, value in zip(self._sections, self._options, self._staged):
+            if value != self._original[section][option]:
+                changes.setdefault(section, {})[option] = value
+        if not changes:
+            self.parent.add_message_to_display("[信息] 配置无更改，未重新保存。")
+            self._close()
+            return
+
+        config = self.config_instance.config
+        previous = {section: {option: config.get(section, option, raw=True) for option in options}
+                    for section, options in changes.items()}
+        try:
+            # 修改一次性写入内存中的配置再保存到文件；写入文件失败时恢复内存中的原值
+            success, message = self.config_instance.apply_values(changes)
+            if success:
+                success, message = self.config_instance.save_config()
+                if not success:
+                    self.config_instance.apply_values(previous)
+            
+            if success:
+                # 由主窗口使用新设置更新 DNSCacheTool 实例
+                self.parent.event_generate('<<ConfigSaved>>')
                 self.parent.gui_message_callback(f"配置已成功保存: {message}")
                 self.parent.status_bar_text_var.set("配置已保存。")
             else:
                 self.parent.gui_message_callback(f"保存配置时出错: {message}", is_error=True)
                 messagebox.showerror("保存错误", f"无法保存配置:\n{message}", parent=self)
-                return # 如果保存失败则不销毁窗口
+                return # 如果保存失败则不关闭窗口
         except Exception as e:
             self.parent.gui_message_callback(f"保存配置时发生异常: {e}", is_error=True)
             messagebox.showerror("保存错误", f"发生意外错误:\n{e}", parent=self)
-            return # 不销毁窗口
+            return # 不关闭窗口
 
-        self.destroy()
+        self._close()
+
+    def cancel(self):
+        """放弃修改：修改从未写入配置，直接关闭，下次打开时输入框会重新载入当前配置"""
+        self._close()
 
 
 class App(tk.Tk):
@@ -101,18 +289,36 @@ class App(tk.Tk):
         self.only_subdomains_var = tk.BooleanVar()
         self.status_bar_text_var = tk.StringVar()
         self.status_bar_text_var.set("准备就绪。正在初始化后端...")
+        self._log_queue = collections.deque() # 等待写入日志区域的消息
+        self._log_flush = CoalescedFlush(self, self.post_to_ui, LOG_FLUSH_INTERVAL_MS, self._flush_log)
+        self._ui_queue = queue.SimpleQueue() # 后台线程提交的界面更新，由主线程执行
+        self._pending_progress = None # 最新的进度 (kind, args)，由 _flush_progress 渲染
+        self._progress_flush = CoalescedFlush(self, self.post_to_ui, STATUS_FLUSH_INTERVAL_MS, self._flush_progress)
+        self._last_display_update = 0.0 # 上次将进度写入日志区域的时间
+        self._progress_handlers = {
+            ProgressKind.COLLECT: self._on_collect_progress,
+            ProgressKind.QUERY: self._on_query_progress,
+        }
+        # 收集、加载和查询等耗时操作共用一个后台工作线程，同一时间只运行一个操作
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='dns-task')
 
         # --- 初始化后端 ---
         # 注意: dns_cache_tool.py 中的 Config 类在其 __init__ 中加载其配置
         # 并且其 load_config/save_config 方法返回状态消息。
         # 这些消息目前尚未在此处捕获以供显示，但如果需要可以添加。
-        self.config_instance = Config() 
         # 将 GUI 特定的回调传递给 DNSCacheTool
         self.dns_tool_instance = DNSCacheTool(
             progress_callback=self.gui_progress_callback,
             message_callback=self.gui_message_callback
         )
+        # 与后端共用同一个配置对象：不再重复读取 config.ini，编辑后的 MaxWorkers、BatchSize 等设置也直接对查询生效
+        self.config_instance = self.dns_tool_instance.config
         self.status_bar_text_var.set("后端已初始化。准备就绪。")
+        self._config_dialog = None
+        self._perf_dialog = None
+        self.bind('<<ConfigSaved>>', self._on_config_saved)
+        # 在后台清理之前异常退出时遗留的临时文件，不阻塞界面启动
+        self._executor.submit(self.dns_tool_instance.sweep_stale_temp_files)
 
 
         # --- 主布局 ---
@@ -138,6 +344,23 @@ class App(tk.Tk):
         # --- 状态栏 (底部) ---
         self._create_status_bar()
 
+        # 耗时操作运行期间需要禁用的按钮（导出通常很快，不包括在内）
+        self._long_op_buttons = (self.collect_button, self.load_query_button, self.import_button, self.perf_test_button)
+
+        # 后台线程提交界面更新时向管道写入一个字节唤醒事件循环，空闲时不再定时轮询。
+        # Windows 的 Tk 不支持 createfilehandler，仍使用 after 轮询
+        self._wakeup_r = self._wakeup_w = None
+        if os.name != 'nt' and hasattr(self.tk, 'createfilehandler'):
+            self._wakeup_r, self._wakeup_w = os.pipe()
+            os.set_blocking(self._wakeup_r, False)
+            os.set_blocking(self._wakeup_w, False)
+            self._drain_after_id = None
+            self.tk.createfilehandler(self._wakeup_r, tk.READABLE, self._on_ui_wakeup)
+            if not self._ui_queue.empty():
+                self._drain_ui_queue() # 初始化期间已提交的更新
+        else:
+            self.after(UI_POLL_INTERVAL_MS, self._drain_ui_queue)
+
     def _create_domain_collection_frame(self, parent):
         frame = ttk.LabelFrame(parent, text="域名收集", padding="10")
         frame.pack(fill=tk.X, pady=5)
@@ -171,6 +394,9 @@ class App(tk.Tk):
         self.export_button = ttk.Button(frame, text="导出DNS查询结果", command=self.export_dns_results_cb) 
         self.export_button.pack(fill=tk.X, padx=5, pady=5)
 
+        self.clear_cache_button = ttk.Button(frame, text="清除DNS缓存", command=self.clear_dns_cache_cb)
+        self.clear_cache_button.pack(fill=tk.X, padx=5, pady=5)
+
     def _create_settings_performance_frame(self, parent):
         frame = ttk.LabelFrame(parent, text="设置与性能", padding="10")
         frame.pack(fill=tk.X, pady=5)
@@ -189,60 +415,132 @@ class App(tk.Tk):
         self.display_text.pack(expand=True, fill=tk.BOTH, padx=5, pady=5)
         self.display_text.configure(state='disabled') # 初始为只读
 
+        # 日志区域最多保留 LOG_MAX_LINES 行，需要完整记录时可先复制出来
+        log_menu = tk.Menu(self.display_text, tearoff=0)
+        log_menu.add_command(label="复制全部", command=self._copy_log_to_clipboard)
+        log_menu.add_command(label="清空日志", command=self._clear_log)
+        self.display_text.bind('<Button-3>', lambda event: log_menu.tk_popup(event.x_root, event.y_root))
+
+    def _copy_log_to_clipboard(self):
+        self.clipboard_clear()
+        self.clipboard_append(self.display_text.get('1.0', 'end-1c'))
+        self.status_bar_text_var.set("日志已复制到剪贴板。")
+
+    def _clear_log(self):
+        self.display_text.configure(state='normal')
+        self.display_text.delete('1.0', tk.END)
+        self.display_text.configure(state='disabled')
+
     def _create_status_bar(self):
         status_bar_frame = ttk.Frame(self, relief=tk.SUNKEN, padding=(2, 5))
         status_bar_frame.pack(side=tk.BOTTOM, fill=tk.X)
         
+        # 进度条显示当前操作的完成百分比，只在整数百分比变化时更新
+        self.progress_var = tk.IntVar(value=0)
+        self.progress_bar = ttk.Progressbar(status_bar_frame, mode='determinate', maximum=100,
+                                            variable=self.progress_var, length=160)
+        self.progress_bar.pack(side=tk.LEFT, padx=(0, 5))
+
         self.status_bar_label = ttk.Label(status_bar_frame, textvariable=self.status_bar_text_var, anchor=tk.W)
-        self.status_bar_label.pack(fill=tk.X)
+        self.status_bar_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+
+    # --- 线程间的界面更新 ---
+    def post_to_ui(self, func, *args):
+        """在Tk主线程中执行 func(*args)。Tk不是线程安全的，后台线程只能通过此方法更新界面。"""
+        self._ui_queue.put((func, args))
+        wakeup_w = getattr(self, '_wakeup_w', None) # 管道在状态栏创建后才建立，此前的更新由首次处理补上
+        if wakeup_w is not None:
+            try:
+                os.write(wakeup_w, b'x')
+            except BlockingIOError:
+                pass # 管道已满，说明主线程尚未处理之前的唤醒，无需再写
+
+    def _on_ui_wakeup(self, fd, mask):
+        try:
+            while os.read(fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        self._drain_ui_queue()
+
+    def _drain_ui_queue(self):
+        try:
+            for _ in range(UI_QUEUE_BATCH):
+                try:
+                    func, args = self._ui_queue.get_nowait()
+                except queue.Empty:
+                    break
+                func(*args)
+        finally:
+            if self._wakeup_r is None:
+                self.after(UI_POLL_INTERVAL_MS, self._drain_ui_queue)
+            elif not self._ui_queue.empty() and self._drain_after_id is None:
+                # 一次没有处理完，剩余的稍后继续，期间事件循环可以响应用户操作
+                self._drain_after_id = self.after(UI_POLL_INTERVAL_MS, self._drain_remaining_ui_queue)
+
+    def _drain_remaining_ui_queue(self):
+        self._drain_after_id = None
+        self._drain_ui_queue()
 
     # --- 用于后端的GUI回调 ---
-    def gui_progress_callback(self, message_prefix, current_count, *args):
-        # DNSCacheTool process_domain 回调: (message, current_collected, target_count)
-        # DNSCacheTool batch_query_dns 回调: (message_prefix, success_count, processed_count, total_domain_count)
-        
-        status_msg = ""
-        display_msg = ""
-
-        if "正在处理域名" in message_prefix: # 来自 collect_domains -> process_domain
-            # message_prefix 在这里类似于 "正在处理域名: example.com"
-            # current_count 是 len(self.collected_domains)
-            # args[0] 是 self.target_count
-            target_count = args[0] if args else "?"
-            domain_being_processed = message_prefix.split(':')[-1].strip()
-            status_msg = f"收集中: {domain_being_processed} ({current_count}/{target_count})"
-            if current_count % 10 == 0 or current_count == target_count : # 定期更新显示区域
-                 display_msg = f"已收集: {current_count} 个域名。当前: {domain_being_processed}"
-        
-        elif "DNS查询进度" in message_prefix: # 来自 batch_query_dns
-            # message_prefix 是 "DNS查询进度: X%"
-            # current_count 是 success_count
-            # args[0] 是 processed_count, args[1] 是 total_domain_count
-            processed_count = args[0] if args else "?"
-            total_domains = args[1] if len(args) > 1 else "?"
-            status_msg = f"{message_prefix} (成功:{current_count}/已处理:{processed_count}/总数:{total_domains})"
-            if processed_count != "?" and (int(processed_count) % 50 == 0 or int(processed_count) == int(total_domains)):
-                display_msg = status_msg
-        else: # 通用消息
-            status_msg = f"{message_prefix}: {current_count}"
-            if args:
-                status_msg += f" / {args[0]}"
-                if len(args) > 1:
-                    status_msg += f" (总计: {args[1]})"
-
-        if status_msg:
-            self.status_bar_text_var.set(status_msg)
-        if display_msg:
-            self.add_message_to_display(display_msg)
+    # 后端在工作线程中调用这些回调，实际的界面更新转交主线程执行
+    def gui_progress_callback(self, kind, *args):
+        # 只保存最新的进度，每个 STATUS_FLUSH_INTERVAL_MS 周期最多渲染一次；
+        # 渲染时总是取最新值，因此最终进度不会被节流丢弃
+        self._pending_progress = (kind, args)
+        self._progress_flush.request()
+
+    def _flush_progress(self):
+        kind, args = self._pending_progress
+        self._render_progress(kind, *args)
 
     def gui_message_callback(self, message, is_error=False):
+        # 日志行直接进入线程安全的队列，只有需要显示在状态栏中的消息才转交主线程
+        prefix = "[错误] " if is_error else "[信息] "
+        self.add_message_to_display(prefix + message)
+        if is_error or STATUS_MESSAGE_RE.search(message):
+            self.post_to_ui(self._render_status_message, message, is_error)
+
+    def _render_progress(self, kind, *args):
+        self._progress_handlers[kind](*args)
+
+    def _set_progress(self, current_count, total_count):
+        percentage = min(100, current_count * 100 // total_count) if total_count > 0 else 0
+        if percentage != self.progress_var.get(): # 百分比未变化时不触发重绘
+            self.progress_var.set(percentage)
+        return percentage
+
+    def _on_collect_progress(self, domain, current_count, target_count):
+        # 来自 collect_domains -> process_domain，数量由进度条显示
+        self._set_progress(current_count, target_count)
+        self.status_bar_text_var.set(f"收集中: {domain}")
+        self._display_progress(f"已收集: {current_count} 个域名。当前: {domain}", current_count == target_count)
+
+    def _on_query_progress(self, success_count, processed_count, total_count):
+        # 来自 batch_query_dns / async_batch_query_dns
+        progress_percentage = self._set_progress(processed_count, total_count)
+        status_msg = f"DNS查询进度: {progress_percentage}% (成功:{success_count}/已处理:{processed_count}/总数:{total_count})"
+        self.status_bar_text_var.set(status_msg)
+        self._display_progress(status_msg, processed_count == total_count)
+
+    def _display_progress(self, display_msg, is_final):
+        # 日志区域使用更宽松的间隔，最终进度总是写入
+        now = time.monotonic()
+        if is_final or now - self._last_display_update >= DISPLAY_MIN_INTERVAL:
+            self._last_display_update = now
+            self.add_message_to_display(display_msg)
+
+    def _render_message(self, message, is_error=False):
         prefix = "[错误] " if is_error else "[信息] "
         self.add_message_to_display(prefix + message)
-        # 同时更新状态栏以显示重要消息，例如错误或特定的信息
+        self._render_status_message(message, is_error)
+
+    def _render_status_message(self, message, is_error=False):
+        # 在状态栏中显示重要消息，例如错误或特定的信息
         if is_error:
             self.status_bar_text_var.set(f"错误: {message[:100]}") # 在状态栏中显示截断的错误信息
-        elif "完成" in message or "已保存" in message : # 在状态栏中显示关键的成功消息
-             self.status_bar_text_var.set(message)
+        elif STATUS_MESSAGE_RE.search(message): # 在状态栏中显示关键的成功消息
+            self.status_bar_text_var.set(message)
 
 
     # --- 按钮回调 ---
@@ -254,7 +552,6 @@ class App(tk.Tk):
 
         only_subdomains = self.only_subdomains_var.get()
         
-        self.collect_button.config(state=tk.DISABLED)
         self.add_message_to_display(f"开始为 '{start_domain}' 收集域名 (仅子域名: {only_subdomains})...")
         self.status_bar_text_var.set(f"正在为 {start_domain} 收集域名...")
 
@@ -268,128 +565,139 @@ class App(tk.Tk):
                 if final_file_path:
                     success_msg += f" 已保存到: {final_file_path}"
                 self.gui_message_callback(success_msg) # 使用我们的消息回调
-                self.status_bar_text_var.set(f"{start_domain} 的收集完成。")
+                self.post_to_ui(self.status_bar_text_var.set, f"{start_domain} 的收集完成。")
 
             except Exception as e:
                 self.gui_message_callback(f"为 '{start_domain}' 收集域名时出错: {e}", is_error=True)
-                self.status_bar_text_var.set("收集失败。")
-            finally:
-                # 确保按钮在主线程中重新启用
-                self.after(0, lambda: self.collect_button.config(state=tk.NORMAL))
+                self.post_to_ui(self.status_bar_text_var.set, "收集失败。")
 
-        # 在新线程中运行后端任务以保持GUI响应
-        thread = threading.Thread(target=collection_task)
-        thread.daemon = True # 允许主程序即使线程正在运行也能退出
-        thread.start()
+        # 在后台工作线程中运行后端任务以保持GUI响应
+        self.submit_long_operation(collection_task)
+
+    def submit_long_operation(self, task, on_done=None):
+        """在后台工作线程中执行耗时操作。执行期间禁用相关按钮，结束后在主线程中恢复，
+        并以 Future 调用 on_done（任务被取消时不调用）。返回该 Future。"""
+        self._disable_long_operation_buttons()
+        self._set_progress(0, 1)
+        future = self._executor.submit(task)
+        future.add_done_callback(functools.partial(self.post_to_ui, self._on_long_operation_done, on_done))
+        return future
+
+    def _on_long_operation_done(self, on_done, future):
+        self._enable_long_operation_buttons()
+        if future.cancelled(): # 主窗口关闭时尚未开始的任务会被取消
+            return
+        if future.exception() is not None: # 任务内部未捕获的异常
+            self._render_message(f"后台任务出错: {future.exception()}", is_error=True)
+        elif on_done:
+            on_done(future)
 
     def _disable_long_operation_buttons(self):
-        self.collect_button.config(state=tk.DISABLED)
-        self.load_query_button.config(state=tk.DISABLED)
-        self.import_button.config(state=tk.DISABLED)
-        # self.export_button.config(state=tk.DISABLED) # 导出通常很快
-        self.perf_test_button.config(state=tk.DISABLED)
+        for button in self._long_op_buttons:
+            button.state(['disabled'])
 
     def _enable_long_operation_buttons(self):
-        self.collect_button.config(state=tk.NORMAL)
-        self.load_query_button.config(state=tk.NORMAL)
-        self.import_button.config(state=tk.NORMAL)
-        # self.export_button.config(state=tk.NORMAL)
-        self.perf_test_button.config(state=tk.NORMAL)
+        for button in self._long_op_buttons:
+            button.state(['!disabled'])
 
     def load_domains_for_query_cb(self):
         filepath = filedialog.askopenfilename(
             title="选择域名文件",
-            filetypes=(("JSON 文件", "*.json"), ("文本文件", "*.txt"), ("CSV 文件", "*.csv"), ("所有文件", "*.*"))
+            filetypes=DOMAIN_FILETYPES
         )
         if not filepath:
             self.status_bar_text_var.set("域名加载已取消。")
             return
 
+        filename = Path(filepath).name
         self.add_message_to_display(f"正在从以下位置加载域名: {filepath}")
-        self.status_bar_text_var.set(f"正在从 {os.path.basename(filepath)} 加载域名...")
-        
-        # 后端 load_domains_from_file 使用 message_callback 来处理成功/失败
-        loaded_domains = self.dns_tool_instance.load_domains_from_file(filepath) 
-        # 后端中的 load_domains_from_file 现在也会设置 self.dns_tool_instance.collected_domains
-        # 和 self.dns_tool_instance.current_source_file
-
-        if not loaded_domains: # load_domains_from_file 在失败时返回空集合
-            self.status_bar_text_var.set(f"从 {os.path.basename(filepath)} 加载域名失败。")
-            # load_domains_from_file 内的消息回调应该已经提供了详细信息。
-            return
-
-        # 如果域名已加载，则在新线程中查询它们
-        self.add_message_to_display(f"成功加载 {len(loaded_domains)} 个域名。开始DNS查询...")
-        self.status_bar_text_var.set(f"正在查询 {len(loaded_domains)} 个域名...")
-        self._disable_long_operation_buttons()
+        self.status_bar_text_var.set(f"正在从 {filename} 加载域名...")
 
-        def batch_query_task():
+        def load_and_query_task():
             try:
+                # 大文件的解析可能需要数秒，加载和查询都在工作线程中进行
+                # 后端 load_domains_from_file 使用 message_callback 来处理成功/失败，
+                # 同时设置 collected_domains 和 current_source_file
+                loaded_domains = self.dns_tool_instance.load_domains_from_file(filepath)
+                if not loaded_domains: # load_domains_from_file 在失败时返回空集合
+                    self.post_to_ui(self.status_bar_text_var.set, f"从 {filename} 加载域名失败。")
+                    return
+
+                self.post_to_ui(self.add_message_to_display, f"成功加载 {len(loaded_domains)} 个域名。开始DNS查询...")
+                self.post_to_ui(self.status_bar_text_var.set, f"正在查询 {len(loaded_domains)} 个域名...")
+
                 # 后端 batch_query_dns 使用进度和消息回调
-                # 此处传递 file_path 很重要，以便导出功能可以将其用于命名
-                success_count, total_count, dns_results = self.dns_tool_instance.batch_query_dns(file_path=filepath) 
+                # 直接查询已加载的域名，不再重新读取文件；file_path 仅用于导出时的命名
+                success_count, total_count, dns_results = self.dns_tool_instance.batch_query_dns(file_path=filepath, domains=loaded_domains) 
                 
                 # 完成后的最终消息
-                msg = f"{os.path.basename(filepath)} 的批量DNS查询完成。成功: {success_count}/{total_count}。"
+                msg = f"{filename} 的批量DNS查询完成。成功: {success_count}/{total_count}。"
                 self.gui_message_callback(msg) # 使用主消息回调
-                self.status_bar_text_var.set(f"{os.path.basename(filepath)} 的查询完成。")
+                self.post_to_ui(self.status_bar_text_var.set, f"{filename} 的查询完成。")
             except Exception as e:
-                self.gui_message_callback(f"对 '{os.path.basename(filepath)}' 进行批量DNS查询时出错: {e}", is_error=True)
-                self.status_bar_text_var.set("批量DNS查询失败。")
-            finally:
-                self.after(0, self._enable_long_operation_buttons)
+                self.gui_message_callback(f"对 '{filename}' 进行批量DNS查询时出错: {e}", is_error=True)
+                self.post_to_ui(self.status_bar_text_var.set, "批量DNS查询失败。")
         
-        thread = threading.Thread(target=batch_query_task)
-        thread.daemon = True
-        thread.start()
+        self.submit_long_operation(load_and_query_task)
 
     def import_domain_list_cb(self):
         filepath = filedialog.askopenfilename(
             title="选择要导入的域名文件",
-            filetypes=(("JSON 文件", "*.json"), ("CSV 文件", "*.csv"), ("文本文件", "*.txt"), ("所有文件", "*.*"))
+            filetypes=DOMAIN_FILETYPES
         )
         if not filepath:
             self.status_bar_text_var.set("域名导入已取消。")
             return
 
+        filename = Path(filepath).name
         self.add_message_to_display(f"正在从以下位置导入域名: {filepath}")
-        self.status_bar_text_var.set(f"正在从 {os.path.basename(filepath)} 导入域名...")
-        
-        # 后端 load_domains_from_file 使用 message_callback 处理成功/失败消息
-        # 并更新 self.dns_tool_instance.collected_domains
-        imported_domains = self.dns_tool_instance.load_domains_from_file(filepath)
+        self.status_bar_text_var.set(f"正在从 {filename} 导入域名...")
+
+        def import_task():
+            imported_domains = set()
+            try:
+                # 后端 load_domains_from_file 使用 message_callback 处理成功/失败消息
+                # 并更新 self.dns_tool_instance.collected_domains
+                imported_domains = self.dns_tool_instance.load_domains_from_file(filepath)
+            except Exception as e:
+                self.gui_message_callback(f"导入域名文件时出错: {e}", is_error=True)
+            finally:
+                # 是否继续查询需要询问用户，交回主线程处理
+                self.post_to_ui(self._ask_then_query, imported_domains, filename)
 
+        self.submit_long_operation(import_task)
+
+    def _ask_then_query(self, imported_domains, filename):
         if not imported_domains:
             # 错误消息应已由 load_domains_from_file 的回调显示
-            self.status_bar_text_var.set(f"从 {os.path.basename(filepath)} 导入域名失败。")
+            self.status_bar_text_var.set(f"从 {filename} 导入域名失败。")
             return
         
         # 成功导入的消息由 load_domains_from_file 的回调处理。
         self.status_bar_text_var.set(f"已导入 {len(imported_domains)} 个域名。准备就绪。")
 
-        if messagebox.askyesno("查询 DNS", f"成功导入 {len(imported_domains)} 个域名。是否要对当前集合执行DNS查询?"):
-            self.add_message_to_display(f"开始对所有 {len(self.dns_tool_instance.collected_domains)} 个收集到的域名进行DNS查询...")
-            self.status_bar_text_var.set(f"正在查询 {len(self.dns_tool_instance.collected_domains)} 个域名...")
-            self._disable_long_operation_buttons()
+        # 非阻塞确认：对话框打开期间事件循环照常运行，用户选择"是"后再启动查询
+        ConfirmDialog(self, "查询 DNS", f"成功导入 {len(imported_domains)} 个域名。是否要对当前集合执行DNS查询?",
+                      on_yes=self._start_import_query)
 
-            def batch_query_task_for_import():
-                try:
-                    # 查询当前收集的域名 (包括新导入的域名)
-                    # 传递 file_path=None 以指示查询 self.collected_domains
-                    success_count, total_count, dns_results = self.dns_tool_instance.batch_query_dns(file_path=None) 
-                    
-                    msg = f"导入列表的批量DNS查询完成。成功: {success_count}/{total_count}。"
-                    self.gui_message_callback(msg)
-                    self.status_bar_text_var.set("导入列表的查询完成。")
-                except Exception as e:
-                    self.gui_message_callback(f"导入列表的批量DNS查询出错: {e}", is_error=True)
-                    self.status_bar_text_var.set("导入列表的批量DNS查询失败。")
-                finally:
-                    self.after(0, self._enable_long_operation_buttons)
-            
-            thread = threading.Thread(target=batch_query_task_for_import)
-            thread.daemon = True
-            thread.start()
+    def _start_import_query(self):
+        self.add_message_to_display(f"开始对所有 {len(self.dns_tool_instance.collected_domains)} 个收集到的域名进行DNS查询...")
+        self.status_bar_text_var.set(f"正在查询 {len(self.dns_tool_instance.collected_domains)} 个域名...")
+
+        def batch_query_task_for_import():
+            try:
+                # 查询当前收集的域名 (包括新导入的域名)
+                # 传递 file_path=None 以指示查询 self.collected_domains
+                success_count, total_count, dns_results = self.dns_tool_instance.batch_query_dns(file_path=None) 
+                
+                msg = f"导入列表的批量DNS查询完成。成功: {success_count}/{total_count}。"
+                self.gui_message_callback(msg)
+                self.post_to_ui(self.status_bar_text_var.set, "导入列表的查询完成。")
+            except Exception as e:
+                self.gui_message_callback(f"导入列表的批量DNS查询出错: {e}", is_error=True)
+                self.post_to_ui(self.status_bar_text_var.set, "导入列表的批量DNS查询失败。")
+        
+        self.submit_long_operation(batch_query_task_for_import)
 
     def export_dns_results_cb(self):
         if not self.dns_tool_instance.dns_results:
@@ -397,46 +705,31 @@ class App(tk.Tk):
             self.status_bar_text_var.set("导出已取消：无结果。")
             return
 
-        file_types = [("JSON 文件", "*.json"), ("CSV 文件", "*.csv")]
         # asksaveasfilename 返回所选文件的完整路径 (如果取消则为空字符串)
         # 如果用户未键入，则会自动附加所选文件类型的扩展名。
+        # typevariable 会被设置为用户选择的文件类型名称，文件名没有可识别的扩展名时据此确定导出格式
+        file_type_var = tk.StringVar(value=EXPORT_FILETYPES[0][0])
         export_filepath = filedialog.asksaveasfilename(
             title="导出DNS查询结果",
             defaultextension=".json", # 如果用户未指定且未选择类型，则为默认值
-            filetypes=file_types
+            filetypes=EXPORT_FILETYPES,
+            typevariable=file_type_var
         )
 
         if not export_filepath:
             self.status_bar_text_var.set("导出已取消。")
             return
 
-        # 从所选文件名扩展名确定格式
-        chosen_format = ""
-        if export_filepath.endswith(".json"):
-            chosen_format = "json"
-        elif export_filepath.endswith(".csv"):
-            chosen_format = "csv"
-        else:
-            # 如果 defaultextension 和 filetypes 按预期工作，
-            # 或者如果在此对话框之前我们强制选择，则理想情况下不应发生这种情况。
-            messagebox.showerror("错误", "无法从文件名确定导出格式。请使用 .json 或 .csv 扩展名。")
-            self.status_bar_text_var.set("导出失败：未知格式。")
-            return
+        # 以用户键入的扩展名为准（如在 JSON 类型下输入 out.csv），没有可识别的扩展名时才使用所选的文件类型
+        chosen_format = EXPORT_SUFFIXES.get(Path(export_filepath).suffix.lower())
+        if chosen_format is None:
+            chosen_format = EXPORT_FORMATS.get(file_type_var.get(), "json")
         
         self.add_message_to_display(f"正在将DNS结果导出为 {chosen_format.upper()} 到 {export_filepath}...")
         self.status_bar_text_var.set(f"正在导出为 {chosen_format.upper()}...")
 
         try:
-            # 后端的 export_results 方法现在会生成自己的文件名，
-            # 但GUI理想情况下应建议名称/路径。
-            # 目前，我们将让后端命名它，但通知用户实际路径。
-            # 假设此步骤中 export_results 将使用该格式。
-            # 后端 `export_results` 返回它使用的实际路径。
-            
-            # 后端 `export_results` 已设计为在其 `data_dir` 中创建自己的带时间戳的文件名，
-            # 我们只需要使用格式调用它。
-            
-            actual_saved_path = self.dns_tool_instance.export_results(format_type=chosen_format)
+            actual_saved_path = self.dns_tool_instance.export_results(format_type=chosen_format, path=export_filepath)
 
             if actual_saved_path:
                 self.gui_message_callback(f"成功将DNS结果导出到: {actual_saved_path}")
@@ -450,21 +743,60 @@ class App(tk.Tk):
             self.status_bar_text_var.set("导出错误。")
 
 
+    def clear_dns_cache_cb(self):
+        cached_count = len(self.dns_tool_instance.resolve_cache)
+        self.dns_tool_instance.resolve_cache.clear()
+        self.add_message_to_display(f"已清除 {cached_count} 条DNS缓存记录，下次查询将重新解析所有域名。")
+        self.status_bar_text_var.set("DNS缓存已清除。")
+
     def edit_configuration_cb(self):
-        config_dialog = ConfigEditorDialog(self, self.config_instance, self.dns_tool_instance)
-        self.wait_window(config_dialog) # 等待对话框关闭
+        # 对话框不阻塞回调；关闭时只隐藏，之后再次打开时复用已创建的控件
+        if self._config_dialog is not None and self._config_dialog.winfo_exists():
+            if self._config_dialog.winfo_viewable():
+                self._config_dialog.lift()
+            else:
+                self._config_dialog.show()
+            return
+        self._config_dialog = ConfigEditorDialog(self, self.config_instance, self.dns_tool_instance)
 
     def run_performance_test_cb(self):
-        perf_dialog = PerformanceTestDialog(self, self.config_instance, self.dns_tool_instance)
-        self.wait_window(perf_dialog)
+        if self._perf_dialog is not None and self._perf_dialog.winfo_exists():
+            self._perf_dialog.show()
+            return
+        self._perf_dialog = PerformanceTestDialog(self, self.config_instance, self.dns_tool_instance)
+
+    def _on_config_saved(self, event=None):
+        """配置保存或应用推荐设置后，使用新设置更新 DNSCacheTool 实例"""
+        self.dns_tool_instance.target_count = self.config_instance.target_count
+        # 直接修改现有速率限制器的上限，不重新创建限制器，上限未变化时 set_qps 不做任何事
+        if self.dns_tool_instance.rate_limiter.set_qps(self.config_instance.qps):
+            self.add_message_to_display(f"[信息] 查询速率上限已调整为每秒 {self.config_instance.qps} 次。")
+        self.dns_tool_instance.resolve_cache.ttl = min(self.config_instance.cache_ttl, RESOLVE_CACHE_TTL)
+
 
+    def destroy(self):
+        # 不等待仍在运行的后台任务，也不再启动排队中的任务
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._wakeup_r is not None:
+            # 管道本身在进程退出时释放，避免后台线程写入已关闭（可能被复用）的描述符
+            self.tk.deletefilehandler(self._wakeup_r)
+        super().destroy()
 
     # --- 辅助方法 ---
     def add_message_to_display(self, message):
-        self.display_text.configure(state='normal') # 启用写入
-        self.display_text.insert(tk.END, message + "\n")
-        self.display_text.see(tk.END) # 滚动到底部
-        self.display_text.configure(state='disabled') # 禁用写入
+        """将一行消息加入日志队列。可在任意线程中调用，日志区域只在主线程的 _flush_log 中批量更新。"""
+        self._log_queue.append(message)
+        self._log_flush.request()
+
+    def _flush_log(self):
+        # 超出日志上限的旧消息写入后会立即被删除，直接丢弃
+        while len(self._log_queue) > LOG_MAX_LINES:
+            self._log_queue.popleft()
+        batch = []
+        while self._log_queue:
+            batch.append(self._log_queue.popleft())
+        if batch:
+            append_lines_to_log(self.display_text, batch)
 
 class PerformanceTestDialog(tk.Toplevel):
     def __init__(self, parent, config_instance: Config, dns_tool_instance: DNSCacheTool):
@@ -476,7 +808,11 @@ class PerformanceTestDialog(tk.Toplevel):
         self.config_instance = config_instance
         self.dns_tool_instance = dns_tool_instance
         self.tester_instance = None # 将保存 DNSPerformanceTester 实例
+        self._log_queue = collections.deque() # 等待插入表格的 (时间, 类型, 内容, 是否错误)
+        self._log_flush = CoalescedFlush(self, parent.post_to_ui, LOG_FLUSH_INTERVAL_MS, self._flush_log)
+        self._output_rows = collections.deque() # 表格中现有行的ID，按插入顺序
         self.optimal_config_path = None # 用于存储 optimal_config.ini 的路径
+        self._optimal_values = None # 测试得出的推荐参数 {节: {选项: 值}}，应用时无需再读取文件
 
         # --- 变量 ---
         self.domain_source_var = tk.StringVar(value="default")
@@ -511,9 +847,19 @@ class PerformanceTestDialog(tk.Toplevel):
         # 显示区域
         display_frame = ttk.LabelFrame(main_frame, text="测试输出与结果", padding="10")
         display_frame.pack(expand=True, fill=tk.BOTH, pady=5)
-        self.display_text = scrolledtext.ScrolledText(display_frame, wrap=tk.WORD, height=15)
-        self.display_text.pack(expand=True, fill=tk.BOTH)
-        self.display_text.configure(state='disabled')
+        # Treeview 只绘制可见的行，输出很多时插入的开销不随总行数增长
+        self.output_tree = ttk.Treeview(display_frame, columns=('time', 'event', 'value'), show='headings', height=15)
+        self.output_tree.heading('time', text="时间")
+        self.output_tree.heading('event', text="类型")
+        self.output_tree.heading('value', text="内容")
+        self.output_tree.column('time', width=70, stretch=False)
+        self.output_tree.column('event', width=50, stretch=False)
+        self.output_tree.column('value', width=520)
+        self.output_tree.tag_configure('error', foreground='red')
+        output_scrollbar = ttk.Scrollbar(display_frame, orient=tk.VERTICAL, command=self.output_tree.yview)
+        self.output_tree.configure(yscrollcommand=output_scrollbar.set)
+        output_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.output_tree.pack(expand=True, fill=tk.BOTH)
 
         # 控制按钮框架
         controls_frame = ttk.Frame(main_frame, padding=(0, 10, 0, 0))
@@ -525,27 +871,67 @@ class PerformanceTestDialog(tk.Toplevel):
         self.apply_button = ttk.Button(controls_frame, text="应用推荐设置", command=self._apply_recommendations_cb, state=tk.DISABLED)
         self.apply_button.pack(side=tk.LEFT, padx=5)
         
-        close_button = ttk.Button(controls_frame, text="关闭", command=self.destroy)
+        close_button = ttk.Button(controls_frame, text="关闭", command=self._close)
         close_button.pack(side=tk.RIGHT, padx=5)
 
-        self.protocol("WM_DELETE_WINDOW", self.destroy)
+        # 测试期间需要禁用的控件（rb_current 还取决于是否有已收集的域名，单独处理）
+        self._test_controls = (self.start_test_button, self.rb_file, self.browse_button, self.rb_default)
+        self._controls_disabled = False
+        self._last_status_text = None # 上次写入主窗口状态栏的测试进度
+
+        self.protocol("WM_DELETE_WINDOW", self._close)
         self.geometry("700x550")
         self.resizable(True, True)
 
+    def show(self):
+        """再次打开已隐藏的对话框，保留上次的测试输出和结果"""
+        if not self._controls_disabled: # 域名集合可能在对话框隐藏期间发生了变化
+            self.rb_current.config(state=tk.NORMAL if self.dns_tool_instance.collected_domains else tk.DISABLED)
+        self.deiconify()
+        self.lift()
+        self.grab_set()
+
+    def _close(self):
+        # 只隐藏窗口，测试仍在后台运行时结果也会继续写入输出区域
+        self.grab_release()
+        self.withdraw()
+
     def _add_test_output(self, message, is_error=False):
-        # 确保GUI更新在主线程中完成
-        def append_message():
-            self.display_text.configure(state='normal')
-            prefix = "[错误] " if is_error else ""
-            self.display_text.insert(tk.END, prefix + message + "\n")
-            self.display_text.see(tk.END)
-            self.display_text.configure(state='disabled')
-        self.after(0, append_message)
+        """将消息按行加入待显示队列并请求刷新，不直接操作控件，可在任意线程中调用（也是测试器的输出回调）"""
+        timestamp = time.strftime("%H:%M:%S")
+        event = "错误" if is_error else "信息"
+        # 表格每行只显示一行文本，多行消息按行拆开
+        for line in message.split('\n'):
+            if line.strip():
+                self._log_queue.append((timestamp, event, line, is_error))
+        self._log_flush.request()
+
+    def _flush_log(self):
+        if not self._log_queue:
+            return
+        follow = self.output_tree.yview()[1] >= 0.99 # 仅当视图位于底部时自动滚动
+        # 超出表格行数上限的旧消息插入后会立即被删除，直接丢弃
+        while len(self._log_queue) > PERF_OUTPUT_MAX_ROWS:
+            self._log_queue.popleft()
+        while self._log_queue:
+            timestamp, event, line, is_error = self._log_queue.popleft()
+            self._output_rows.append(self.output_tree.insert('', 'end', values=(timestamp, event, line), tags=('error',) if is_error else ()))
+        if self._controls_disabled:
+            # 测试进行中，主窗口状态栏显示本批最后一行，每个刷新周期最多更新一次
+            status_text = f"性能测试: {line}"
+            if status_text != self._last_status_text:
+                self._last_status_text = status_text
+                self.parent.status_bar_text_var.set(status_text)
+        excess = len(self._output_rows) - PERF_OUTPUT_MAX_ROWS
+        if excess > 0:
+            self.output_tree.delete(*[self._output_rows.popleft() for _ in range(excess)])
+        if follow:
+            self.output_tree.yview_moveto(1.0)
 
     def _browse_file_cb(self):
         filepath = filedialog.askopenfilename(
             title="选择性能测试的域名文件",
-            filetypes=(("JSON 文件", "*.json"), ("文本文件", "*.txt"), ("CSV 文件", "*.csv"), ("所有文件", "*.*"))
+            filetypes=DOMAIN_FILETYPES
         )
         if filepath:
             self.selected_file_path_var.set(filepath)
@@ -559,28 +945,30 @@ class PerformanceTestDialog(tk.Toplevel):
 
 
     def _toggle_controls_during_test(self, is_testing):
+        if self._controls_disabled == is_testing: # 状态未变化，不重复配置控件
+            return
+        self._controls_disabled = is_testing
         state = tk.DISABLED if is_testing else tk.NORMAL
-        self.start_test_button.config(state=state)
+        for widget in self._test_controls:
+            widget.config(state=state)
         self.rb_current.config(state=state if self.dns_tool_instance.collected_domains else tk.DISABLED)
-        self.rb_file.config(state=state)
-        self.browse_button.config(state=state)
-        self.rb_default.config(state=state)
         # 应用按钮根据结果可用性单独处理
 
     def _start_test_cb(self):
         self._toggle_controls_during_test(True)
         self.apply_button.config(state=tk.DISABLED) # 在新测试开始时禁用应用按钮
         self.optimal_config_path = None # 重置先前的优化路径
-        self.display_text.configure(state='normal')
-        self.display_text.delete('1.0', tk.END) # 清除先前的输出
-        self.display_text.configure(state='disabled')
+        self._optimal_values = None
+        if self._output_rows: # 清除先前的输出
+            self.output_tree.delete(*self._output_rows)
+            self._output_rows.clear()
         
         self._add_test_output("性能测试已开始...")
         self.parent.status_bar_text_var.set("性能测试正在运行...")
 
         test_domains_file_for_tester = None
+        test_domains_for_tester = None
         source_choice = self.domain_source_var.get()
-        temp_file_to_delete = None
 
         try:
             if source_choice == "current":
@@ -588,21 +976,28 @@ class PerformanceTestDialog(tk.Toplevel):
                     self._add_test_output("错误: 没有收集到可用于 'current' 来源的域名。", is_error=True)
                     self._toggle_controls_during_test(False)
                     return
-                # 将当前域名保存到临时文件
-                temp_dir = self.dns_tool_instance.data_dir # 使用现有的 data_dir
-                if not os.path.exists(temp_dir): os.makedirs(temp_dir, exist_ok=True)
-                temp_file_to_delete = os.path.join(temp_dir, f"temp_perf_test_domains_{int(time.time())}.json")
-                with open(temp_file_to_delete, 'w', encoding='utf-8') as f:
-                    json.dump(list(self.dns_tool_instance.collected_domains), f)
-                test_domains_file_for_tester = temp_file_to_delete
-                self._add_test_output(f"使用当前 {len(self.dns_tool_instance.collected_domains)} 个收集到的域名 (保存到临时文件: {temp_file_to_delete})。")
+                # 测试器在同一进程中，直接传入域名集合，无需经过临时文件；
+                # 复制为列表由测试器的构造函数在后台线程中完成（测试期间不会有收集任务修改该集合）
+                test_domains_for_tester = self.dns_tool_instance.collected_domains
+                self._add_test_output(f"使用当前 {len(test_domains_for_tester)} 个收集到的域名。")
             
             elif source_choice == "file":
                 selected_path = self.selected_file_path_var.get()
-                if not selected_path or selected_path == "未选择文件" or not os.path.exists(selected_path):
+                if not selected_path or selected_path == "未选择文件":
                     self._add_test_output("错误: 'file' 来源选择的文件无效或未选择文件。", is_error=True)
                     self._toggle_controls_during_test(False)
                     return
+                # 只调用一次 stat，同时检查文件是否存在以及是否为普通文件
+                try:
+                    is_regular_file = stat.S_ISREG(os.stat(selected_path).st_mode)
+                except OSError as e:
+                    self._add_test_output(f"错误: 无法访问所选文件: {e}", is_error=True)
+                    self._toggle_controls_during_test(False)
+                    return
+                if not is_regular_file:
+                    self._add_test_output(f"错误: 所选路径不是普通文件: {selected_path}", is_error=True)
+                    self._toggle_controls_during_test(False)
+                    return
                 test_domains_file_for_tester = selected_path
                 self._add_test_output(f"使用文件中的域名: {test_domains_file_for_tester}")
             
@@ -614,83 +1009,94 @@ class PerformanceTestDialog(tk.Toplevel):
                 self._toggle_controls_during_test(False)
                 return
 
-            self.tester_instance = DNSPerformanceTester(
-                test_domains_file=test_domains_file_for_tester,
-                output_dir=os.path.join(self.dns_tool_instance.data_dir, "test_results"), # 将结果保存在 data_dir 的子文件夹中
-                config=self.config_instance,
-                output_callback=lambda msg, is_error=False: self._add_test_output(msg, is_error=is_error)
-            )
+            output_dir = os.path.join(self.dns_tool_instance.data_dir, "test_results") # 将结果保存在 data_dir 的子文件夹中
+            self.tester_instance = None
 
-            def _run_test_thread_target():
-                results = None
-                try:
-                    results = self.tester_instance.run_tests()
-                except Exception as e:
-                    self._add_test_output(f"性能测试失败: {e}", is_error=True)
-                    self.parent.status_bar_text_var.set("性能测试错误。")
-                finally:
-                    self._toggle_controls_during_test(False)
-                    if results:
-                        best_params, readable_results_path, opt_config_path = results
-                        self.optimal_config_path = opt_config_path # 存储以供应用按钮使用
-                        
-                        recommend_text, _ = self.tester_instance.get_recommendations_text()
-                        self._add_test_output("\n--- 建议 ---")
-                        self._add_test_output(recommend_text)
-                        self._add_test_output(f"\n详细的可读结果已保存到: {readable_results_path}")
-                        self._add_test_output(f"优化配置文件已保存到: {opt_config_path}")
-                        
-                        self.apply_button.config(state=tk.NORMAL)
-                        self.parent.status_bar_text_var.set("性能测试完成。建议可用。")
-                    else:
-                        self._add_test_output("性能测试未产生建议。", is_error=True)
-                        self.parent.status_bar_text_var.set("性能测试完成 (无建议)。")
-                    
-                    if temp_file_to_delete and os.path.exists(temp_file_to_delete):
-                        try:
-                            os.remove(temp_file_to_delete)
-                            self._add_test_output(f"已清理临时文件: {temp_file_to_delete}")
-                        except Exception as e_del:
-                            self._add_test_output(f"删除临时文件 {temp_file_to_delete} 时出错: {e_del}", is_error=True)
-            
-            thread = threading.Thread(target=_run_test_thread_target)
-            thread.daemon = True
-            thread.start()
+            # 与主窗口的耗时操作共用同一个后台工作线程，不再为每次测试新建线程
+            self.parent.submit_long_operation(
+                functools.partial(self._run_test, test_domains_file_for_tester, test_domains_for_tester, output_dir),
+                on_done=self._on_test_done
+            )
 
-        except Exception as e_setup: # 捕获线程开始前的设置错误
+        except Exception as e_setup: # 捕获提交任务前的设置错误
             self._add_test_output(f"设置性能测试时出错: {e_setup}", is_error=True)
             self._toggle_controls_during_test(False)
             self.parent.status_bar_text_var.set("性能测试设置错误。")
-            if temp_file_to_delete and os.path.exists(temp_file_to_delete):
-                try: os.remove(temp_file_to_delete)
-                except: pass
 
 
+    def _run_test(self, test_domains_file, test_domains, output_dir):
+        """在后台工作线程中运行测试，返回 (results, error)。此方法中不能直接操作控件。"""
+        try:
+            # 测试器的构造会读取域名文件并创建结果目录，也放在后台线程中进行
+            self.tester_instance = DNSPerformanceTester(
+                test_domains_file=test_domains_file,
+                output_dir=output_dir,
+                config=self.config_instance,
+                test_domains=test_domains,
+                output_callback=self._add_test_output # 输出交回主线程再写入对话框
+            )
+            return self.tester_instance.run_tests(), None
+        except Exception as e:
+            return None, e
+
+    def _on_test_done(self, future):
+        self._on_test_finished(*future.result())
+
+    def _on_test_finished(self, results, error):
+        """在主线程中处理测试结束后的界面更新"""
+        if not self.winfo_exists(): # 测试期间对话框已关闭
+            self.parent.status_bar_text_var.set("性能测试完成。" if results else "性能测试结束。")
+            return
+        
+        if error is not None:
+            self._add_test_output(f"性能测试失败: {error}", is_error=True)
+            self.parent.status_bar_text_var.set("性能测试错误。")
+        self._toggle_controls_during_test(False)
+        if results:
+            best_params, readable_results_path, opt_config_path = results
+            self.optimal_config_path = opt_config_path # 存储以供应用按钮使用
+            self._optimal_values = self.tester_instance.get_optimal_config_values()
+            
+            recommend_text, _ = self.tester_instance.get_recommendations_text()
+            self._add_test_output("\n--- 建议 ---")
+            self._add_test_output(recommend_text)
+            self._add_test_output(f"\n详细的可读结果已保存到: {readable_results_path}")
+            self._add_test_output(f"优化配置文件已保存到: {opt_config_path}")
+            
+            self.apply_button.config(state=tk.NORMAL)
+            self.parent.status_bar_text_var.set("性能测试完成。建议可用。")
+        else:
+            self._add_test_output("性能测试未产生建议。", is_error=True)
+            if error is None:
+                self.parent.status_bar_text_var.set("性能测试完成 (无建议)。")
+
     def _apply_recommendations_cb(self):
-        if not self.optimal_config_path or not os.path.exists(self.optimal_config_path):
+        if not self.optimal_config_path:
             messagebox.showerror("错误", "未找到优化配置文件或未运行测试。", parent=self)
             return
 
         try:
-            # 将 optimal_config.ini 复制到主 config.ini
+            # 推荐参数已在内存中，直接写入当前配置后保存到主 config.ini；
+            # 没有内存中的结果时才解析 optimal_config.ini
             main_config_file = self.config_instance.config_file # 例如 "config.ini"
-            shutil.copy2(self.optimal_config_path, main_config_file)
-            self._add_test_output(f"已将优化设置从 {self.optimal_config_path} 应用到 {main_config_file}。")
+            if self._optimal_values is not None:
+                success, message = self.config_instance.apply_values(self._optimal_values)
+            else:
+                success, message = self.config_instance.load_from_path(self.optimal_config_path)
+            if success:
+                success, message = self.config_instance.save_config()
+                if success:
+                    self._add_test_output(f"已将优化设置从 {self.optimal_config_path} 应用到 {main_config_file}。")
             
-            # 在主Config实例中重新加载配置并更新DNSCacheTool
-            success, message = self.config_instance.load_config()
             if success:
-                self.dns_tool_instance.target_count = self.config_instance.getint('General', 'TargetCount')
-                self.dns_tool_instance.rate_limiter = DNSRateLimiter(
-                    queries_per_second=self.config_instance.getint('DNS', 'QueriesPerSecond')
-                )
-                # 通知主应用程序
-                self.parent.gui_message_callback(f"配置已从 {main_config_file} 更新并重新加载。")
+                # 通知主应用程序，由主窗口使用新设置更新 DNSCacheTool 实例
+                self.parent.event_generate('<<ConfigSaved>>')
+                self.parent.gui_message_callback(f"配置已从 {self.optimal_config_path} 更新并保存到 {main_config_file}。")
                 self.parent.status_bar_text_var.set("已应用并重新加载新配置。")
                 messagebox.showinfo("成功", "推荐设置已应用并保存。", parent=self)
             else:
-                self.parent.gui_message_callback(f"重新加载新配置时出错: {message}", is_error=True)
-                messagebox.showerror("错误", f"无法重新加载新配置: {message}", parent=self)
+                self.parent.gui_message_callback(f"应用推荐设置时出错: {message}", is_error=True)
+                messagebox.showerror("错误", f"无法应用推荐设置: {message}", parent=self)
 
         except Exception as e:
             self.parent.gui_message_callback(f"应用推荐设置时出错: {e}", is_error=True)
@@ -700,3 +1106,5 @@ class PerformanceTestDialog(tk.Toplevel):
 if __name__ == "__main__":
     app = App()
     app.mainloop()
+    # 线程池的工作线程不是守护线程，直接结束进程，避免窗口关闭后仍等待正在进行的收集或查询
+    os._exit(0)